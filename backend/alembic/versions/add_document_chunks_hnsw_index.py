@@ -0,0 +1,30 @@
+"""Add HNSW cosine index on document_chunks.embedding
+
+Revision ID: add_chunks_hnsw_index
+Revises: chunk_metadata_jsonb
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_chunks_hnsw_index'
+down_revision = 'chunk_metadata_jsonb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Used by the ORDER BY cosine distance in EmbeddingService.similarity_search
+    op.create_index(
+        'idx_document_chunks_embedding_hnsw',
+        'document_chunks',
+        ['embedding'],
+        postgresql_using='hnsw',
+        postgresql_ops={'embedding': 'vector_cosine_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_document_chunks_embedding_hnsw', table_name='document_chunks')
@@ -0,0 +1,29 @@
+"""Add lower() functional indexes for case-insensitive tag/document lookups
+
+Revision ID: add_lower_name_indexes
+Revises: add_messages_chat_created_idx
+Create Date: 2026-10-16 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_lower_name_indexes'
+down_revision = 'add_messages_chat_created_idx'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Used by #tag and /doc reference resolution in chat messages
+    op.create_index('idx_tags_name_lower', 'tags', [sa.text('lower(name)')])
+    op.create_index('idx_documents_title_lower', 'documents', [sa.text('lower(title)')])
+    op.create_index('idx_documents_filename_lower', 'documents', [sa.text('lower(filename)')])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_documents_filename_lower', table_name='documents')
+    op.drop_index('idx_documents_title_lower', table_name='documents')
+    op.drop_index('idx_tags_name_lower', table_name='tags')
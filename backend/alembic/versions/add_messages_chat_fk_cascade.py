@@ -0,0 +1,29 @@
+"""Recreate messages.chat_id foreign key with ON DELETE CASCADE
+
+Revision ID: messages_chat_fk_cascade
+Revises: add_chunks_hnsw_index
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'messages_chat_fk_cascade'
+down_revision = 'add_chunks_hnsw_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The initial schema recreated this key without a cascade; ChatService.delete_chat
+    # relies on the database removing a chat's messages
+    op.execute("ALTER TABLE messages DROP CONSTRAINT IF EXISTS messages_chat_id_fkey")
+    op.create_foreign_key(
+        'messages_chat_id_fkey', 'messages', 'chats', ['chat_id'], ['id'], ondelete='CASCADE'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('messages_chat_id_fkey', 'messages', type_='foreignkey')
+    op.create_foreign_key('messages_chat_id_fkey', 'messages', 'chats', ['chat_id'], ['id'])
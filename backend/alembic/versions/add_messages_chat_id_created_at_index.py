@@ -0,0 +1,29 @@
+"""Add composite (chat_id, created_at DESC) index on messages
+
+Revision ID: add_messages_chat_created_idx
+Revises: 685203ca3cfd, 4b2c8d9e1f3a
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_messages_chat_created_idx'
+down_revision = ('685203ca3cfd', '4b2c8d9e1f3a')
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Serves the per-chat "latest message" lookup and ordered history loads
+    op.create_index(
+        'idx_messages_chat_id_created_at',
+        'messages',
+        ['chat_id', sa.text('created_at DESC')]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_messages_chat_id_created_at', table_name='messages')
@@ -0,0 +1,39 @@
+"""Convert document_chunks.chunk_metadata from TEXT to JSONB
+
+Revision ID: chunk_metadata_jsonb
+Revises: add_lower_name_indexes
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'chunk_metadata_jsonb'
+down_revision = 'add_lower_name_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        'document_chunks',
+        'chunk_metadata',
+        type_=postgresql.JSONB(),
+        existing_type=sa.Text(),
+        existing_nullable=True,
+        postgresql_using='chunk_metadata::jsonb'
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        'document_chunks',
+        'chunk_metadata',
+        type_=sa.Text(),
+        existing_type=postgresql.JSONB(),
+        existing_nullable=True,
+        postgresql_using='chunk_metadata::text'
+    )
@@ -4,6 +4,9 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Backgro
 from fastapi.responses import StreamingResponse, FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 import json
+import orjson
+import logging
+import re
 import asyncio
 import os
 import aiofiles
@@ -19,6 +22,10 @@ from app.services.chat_service import ChatService
 from app.services.embedding_service import embedding_service
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# First JSON object in an LLM response, compiled once
+_JSON_OBJECT_RE = re.compile(r'\{.*?\}', re.DOTALL)
 
 
 @router.get("/chats", response_model=List[ChatListItem])
@@ -186,7 +193,7 @@ async def get_chat_messages(
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    return sorted(chat.messages, key=lambda x: x.created_at)
+    return chat.messages
 
 
 @router.post("/chats/{chat_id}/save-to-knowledge")
@@ -285,7 +292,7 @@ async def save_edited_chat_to_knowledge(
             
             # Generate embeddings
             if chunks:
-                embeddings = embedding_service.embed_texts(chunks)
+                embeddings = await embedding_service.aembed_texts(chunks)
             else:
                 embeddings = []
             
@@ -304,11 +311,11 @@ async def save_edited_chat_to_knowledge(
                     chunk_index=i,
                     token_count=token_count,
                     embedding=embedding,
-                    chunk_metadata=json.dumps({
+                    chunk_metadata={
                         "source_type": "chat",
                         "chat_id": str(chat_id),
                         "edit_mode": "document"
-                    })
+                    }
                 )
                 db.add(document_chunk)
                 document_chunks.append(document_chunk)
@@ -348,7 +355,7 @@ async def save_edited_chat_to_knowledge(
             
             # Generate embeddings
             if chunks:
-                embeddings = embedding_service.embed_texts(chunks)
+                embeddings = await embedding_service.aembed_texts(chunks)
             else:
                 embeddings = []
             
@@ -367,11 +374,11 @@ async def save_edited_chat_to_knowledge(
                     chunk_index=i,
                     token_count=token_count,
                     embedding=embedding,
-                    chunk_metadata=json.dumps({
+                    chunk_metadata={
                         "source_type": "chat",
                         "chat_id": str(chat_id),
                         "edit_mode": "messages"
-                    })
+                    }
                 )
                 db.add(document_chunk)
                 document_chunks.append(document_chunk)
@@ -417,8 +424,7 @@ async def auto_update_chat_title(
             return {"message": "Not enough messages to generate title", "title": chat.title}
         
         # Get the last 3 message pairs (up to 6 messages)
-        sorted_messages = sorted(chat.messages, key=lambda x: x.created_at)
-        recent_messages = sorted_messages[-6:] if len(sorted_messages) >= 6 else sorted_messages
+        recent_messages = chat.messages[-6:]
         
         # Format messages for the prompt
         conversation = "\n".join([
@@ -444,10 +450,9 @@ The title should be concise (3-7 words), descriptive, and capture the main topic
 
         # Use the Azure OpenAI service for title generation
         from app.services.azure_openai import azure_openai_service
-        import re
         
         # Get response from LLM
-        response_text = ""
+        response_parts = []
         async for chunk in azure_openai_service.generate_chat_completion(
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that generates concise chat titles based on conversation content. Always respond with valid JSON."},
@@ -456,12 +461,13 @@ The title should be concise (3-7 words), descriptive, and capture the main topic
             temperature=0.3,  # Lower temperature for more consistent output
             max_tokens=100
         ):
-            response_text += chunk
+            response_parts.append(chunk)
+        response_text = "".join(response_parts)
         
         # Parse the response
         try:
             # Extract JSON from the response
-            json_match = re.search(r'\{.*?\}', response_text, re.DOTALL)
+            json_match = _JSON_OBJECT_RE.search(response_text)
             if json_match:
                 result = json.loads(json_match.group())
                 
@@ -476,7 +482,7 @@ The title should be concise (3-7 words), descriptive, and capture the main topic
                         "message": "Title updated successfully"
                     }
         except (json.JSONDecodeError, AttributeError) as e:
-            print(f"Failed to parse title response: {e}, Response: {response_text}")
+            logger.warning("Failed to parse title response: %s, Response: %s", e, response_text)
         
         return {
             "updated": False,
@@ -540,7 +546,7 @@ async def search_knowledge(
 ):
     """Search across all knowledge (chats, documents, etc.) using vector similarity"""
     try:
-        results = await embedding_service.similarity_search(
+        results, _ = await embedding_service.similarity_search(
             db=db,
             query=query,
             limit=limit,
@@ -551,7 +557,7 @@ async def search_knowledge(
         # Format results for response
         search_results = []
         for chunk in results:
-            chunk_metadata = json.loads(chunk.chunk_metadata) if chunk.chunk_metadata else {}
+            chunk_metadata = chunk.chunk_metadata or {}
             
             result = {
                 "id": str(chunk.id),
@@ -591,7 +597,7 @@ async def get_documents(
     from sqlalchemy.orm import selectinload
     from app.models.chat import Document, DocumentChunk
 
-    print("🔍 [chat.py] GET /documents endpoint called")
+    logger.debug("🔍 [chat.py] GET /documents endpoint called")
     
     try:
         # Get documents with chunk count using a subquery for better performance
@@ -618,7 +624,7 @@ async def get_documents(
                 "updated_at": doc.updated_at.isoformat() if doc.updated_at else None,
                 "chunk_count": chunk_count,
                 "folder_id": str(doc.folder_id) if doc.folder_id else None,
-                "metadata": json.loads(doc.document_metadata) if doc.document_metadata else {}
+                "metadata": orjson.loads(doc.document_metadata) if doc.document_metadata else {}
             }
             for doc, chunk_count in documents_with_counts
         ]
@@ -636,7 +642,7 @@ async def get_document(
     from sqlalchemy.orm import selectinload
     from app.models.chat import Document
     
-    print("Calling documents/document_id")
+    logger.debug("Calling documents/document_id")
     try:
         result = await db.execute(
             select(Document)
@@ -663,7 +669,7 @@ async def get_document(
             "created_at": document.created_at.isoformat() if document.created_at else None,
             "updated_at": document.updated_at.isoformat() if document.updated_at else None,
             "chunk_count": len(document.chunks),
-            "metadata": json.loads(document.document_metadata) if document.document_metadata else {}
+            "metadata": orjson.loads(document.document_metadata) if document.document_metadata else {}
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch document: {str(e)}")
@@ -705,13 +711,13 @@ async def get_document_chunks(
                     "chunk_index": chunk.chunk_index,
                     "token_count": chunk.token_count,
                     "summary": chunk.summary,
-                    "metadata": json.loads(chunk.chunk_metadata) if chunk.chunk_metadata else {}
+                    "metadata": chunk.chunk_metadata or {}
                 }
                 for chunk in sorted_chunks
             ],
             "created_at": document.created_at.isoformat() if document.created_at else None,
             "updated_at": document.updated_at.isoformat() if document.updated_at else None,
-            "metadata": json.loads(document.document_metadata) if document.document_metadata else {}
+            "metadata": orjson.loads(document.document_metadata) if document.document_metadata else {}
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch document chunks: {str(e)}")
@@ -765,11 +771,11 @@ async def update_document_chunks(
                     chunk_index=index,  # Use enumeration index to ensure proper ordering
                     token_count=token_count,
                     embedding=embedding,
-                    chunk_metadata=json.dumps({
+                    chunk_metadata={
                         "source_type": document.source_type,
                         "edited": True,
                         "original_chunk_id": chunk_data.get("id")  # Keep reference to original if needed
-                    })
+                    }
                 )
                 
                 db.add(new_chunk)
@@ -813,7 +819,7 @@ async def process_document_background(
         session_local, engine = create_session_local()
         async with session_local() as db:
             try:
-                logger.info(f"process_document_background called with file_path={file_path}, upload_id={upload_id}")
+                logger.info("process_document_background called with file_path=%s, upload_id=%s", file_path, upload_id)
                 # Process the document using the embedding service
                 document_id, chunks_created = await embedding_service.process_uploaded_document(
                     db=db,
@@ -823,11 +829,11 @@ async def process_document_background(
                 )
                 
                 # Store success status (you could store this in Redis or a status table)
-                logger.info(f"Successfully processed document: {document_id}, created {chunks_created} chunks")
+                logger.info("Successfully processed document: %s, created %s chunks", document_id, chunks_created)
                 
             except Exception as e:
                 # Log the error but do not re-raise to prevent worker crash
-                logger.error(f"Failed to process document {original_filename} (upload_id: {upload_id}): {str(e)}", exc_info=True)
+                logger.error("Failed to process document %s (upload_id: %s): %s", original_filename, upload_id, e, exc_info=True)
                 # Clean up file if processing failed
                 if Path(file_path).exists():
                     Path(file_path).unlink()
@@ -838,7 +844,7 @@ async def process_document_background(
             
     except Exception as e:
         # Catch exceptions during session creation or engine disposal
-        logger.error(f"Critical error in process_document_background for {original_filename} (upload_id: {upload_id}): {str(e)}", exc_info=True)
+        logger.error("Critical error in process_document_background for %s (upload_id: %s): %s", original_filename, upload_id, e, exc_info=True)
         # Clean up file if processing failed
         if Path(file_path).exists():
             Path(file_path).unlink()
@@ -1089,7 +1095,7 @@ async def search_documents_by_name(
                     "created_at": doc.created_at.isoformat() if doc.created_at else None,
                     "updated_at": doc.updated_at.isoformat() if doc.updated_at else None,
                     "chunk_count": chunk_count,
-                    "metadata": json.loads(doc.document_metadata) if doc.document_metadata else {}
+                    "metadata": orjson.loads(doc.document_metadata) if doc.document_metadata else {}
                 }
                 for doc, chunk_count in documents_with_counts
             ],
@@ -1124,7 +1130,7 @@ async def serve_pdf_file(
         
         # Get file path from metadata
         if document.document_metadata:
-            metadata = json.loads(document.document_metadata)
+            metadata = orjson.loads(document.document_metadata)
             file_path = metadata.get("file_path")
             
             if file_path and os.path.exists(file_path):
@@ -1205,10 +1211,10 @@ async def summarize_chat(
             raise HTTPException(status_code=400, detail="Chat has no messages to summarize")
         
         # Build conversation text
-        conversation_text = ""
-        for msg in sorted(chat.messages, key=lambda x: x.created_at):
-            role = "User" if msg.role == "user" else "Assistant"
-            conversation_text += f"{role}: {msg.content}\n\n"
+        conversation_text = "".join(
+            f"{'User' if msg.role == 'user' else 'Assistant'}: {msg.content}\n\n"
+            for msg in chat.messages
+        )
         
         # Create summarization prompt
         summary_prompt = f"""Please provide a concise, informative summary of the following conversation. The summary should:
@@ -1229,9 +1235,10 @@ Please respond with just the summary, no additional formatting."""
             {"role": "user", "content": summary_prompt}
         ]
         
-        summary = ""
+        summary_parts = []
         async for chunk in azure_openai_service.generate_chat_completion(messages):
-            summary += chunk
+            summary_parts.append(chunk)
+        summary = "".join(summary_parts)
         
         return {
             "summary": summary.strip(),
@@ -5,14 +5,16 @@ from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from sqlalchemy.orm import selectinload
-import json
+import orjson
 from pathlib import Path
 import uuid
+import logging
 
 from app.models.database import get_db
 from app.models.chat import Document, DocumentChunk, Folder
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # TODO: Add proper user authentication when implemented
 DEFAULT_USER_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
@@ -35,7 +37,7 @@ async def get_document(
         raise HTTPException(status_code=404, detail="Document not found")
     
     # Parse metadata
-    metadata = json.loads(document.document_metadata) if document.document_metadata else {}
+    metadata = orjson.loads(document.document_metadata) if document.document_metadata else {}
     
     return {
         "id": str(document.id),
@@ -60,8 +62,8 @@ async def get_document_chunks(
     """Get chunks for a specific document, optionally filtered by chunk IDs"""
 
     # Debug logging
-    print(f"🔍 API called with document_id: {document_id}")
-    print(f"🔍 API called with chunk_ids parameter: {chunk_ids}")
+    logger.debug("API called with document_id: %s", document_id)
+    logger.debug("API called with chunk_ids parameter: %s", chunk_ids)
 
     # Verify document exists
     doc_result = await db.execute(
@@ -76,14 +78,14 @@ async def get_document_chunks(
     if chunk_ids:
         # If chunk_ids provided, filter by them directly
         chunk_id_list = [UUID(cid.strip()) for cid in chunk_ids.split(",")]
-        print(f"🔍 Filtering chunks by specific IDs: {chunk_id_list}")
+        logger.debug("Filtering chunks by specific IDs: %s", chunk_id_list)
         query = select(DocumentChunk).where(
             DocumentChunk.document_id == document_id,
             DocumentChunk.id.in_(chunk_id_list)
         )
     else:
         # No chunk_ids, get all chunks for document
-        print(f"🔍 Getting all chunks for document")
+        logger.debug("Getting all chunks for document")
         query = select(DocumentChunk).where(DocumentChunk.document_id == document_id)
     
     # Order by chunk index
@@ -93,14 +95,14 @@ async def get_document_chunks(
     chunks = result.scalars().all()
     
     # Debug logging
-    print(f"🔍 Query returned {len(chunks)} chunks")
+    logger.debug("Query returned %d chunks", len(chunks))
     if chunk_ids and len(chunks) > 0:
-        print(f"🔍 First chunk ID: {chunks[0].id}")
+        logger.debug("First chunk ID: %s", chunks[0].id)
     
     # Format response with metadata
     chunk_data = []
     for chunk in chunks:
-        metadata = json.loads(chunk.chunk_metadata) if chunk.chunk_metadata else {}
+        metadata = chunk.chunk_metadata or {}
         
         chunk_data.append({
             "id": str(chunk.id),
@@ -140,7 +142,7 @@ async def get_document_file(
         raise HTTPException(status_code=400, detail="Document is not file-based")
     
     # Parse metadata to get file path
-    metadata = json.loads(document.document_metadata) if document.document_metadata else {}
+    metadata = orjson.loads(document.document_metadata) if document.document_metadata else {}
     file_path = metadata.get("file_path")
     
     if not file_path or not Path(file_path).exists():
@@ -195,10 +197,10 @@ async def list_documents(
     # Format response
     docs_data = []
     for doc in documents:
-        metadata = json.loads(doc.document_metadata) if doc.document_metadata else {}
+        metadata = orjson.loads(doc.document_metadata) if doc.document_metadata else {}
 
         # Debug: Check what folder_id we have
-        print(f"🔍 Document {doc.title}: folder_id = {doc.folder_id}")
+        logger.debug("Document %s: folder_id = %s", doc.title, doc.folder_id)
 
         docs_data.append({
             "id": str(doc.id),
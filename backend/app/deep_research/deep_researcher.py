@@ -56,6 +56,8 @@ from app.deep_research.utils import (
     is_token_limit_exceeded,
     openai_websearch_called,
     remove_up_to_last_ai_message,
+    shared_llm_http_client,
+    shared_llm_rate_limiter,
     think_tool,
 )
 from app.deep_research.parse_tool_calls import ensure_tool_calls
@@ -63,6 +65,8 @@ from app.deep_research.parse_tool_calls import ensure_tool_calls
 # Initialize a configurable model that we will use throughout the agent
 configurable_model = init_chat_model(
     configurable_fields=("model", "max_tokens", "api_key", "azure_endpoint", "api_version", "deployment_name"),
+    http_async_client=shared_llm_http_client,
+    rate_limiter=shared_llm_rate_limiter,
 )
 
 async def clarify_with_user(state: AgentState, config: RunnableConfig) -> Command[Literal["write_research_brief", "__end__"]]:
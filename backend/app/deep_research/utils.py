@@ -4,13 +4,16 @@ Adapted from: https://github.com/langchain-ai/open_deep_research
 """
 
 import asyncio
+import hashlib
 import logging
 import os
 import warnings
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Annotated, Any, Dict, List, Literal, Optional
 
 import aiohttp
+import httpx
 from langchain.chat_models import init_chat_model
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import (
@@ -19,6 +22,7 @@ from langchain_core.messages import (
     MessageLikeRepresentation,
     filter_messages,
 )
+from langchain_core.rate_limiters import InMemoryRateLimiter
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import (
     BaseTool,
@@ -32,12 +36,73 @@ from langgraph.config import get_store
 # from mcp import McpError
 from tavily import AsyncTavilyClient
 
+from app.config import get_settings
 from app.deep_research.configuration import Configuration, SearchAPI
 from app.deep_research.prompts import summarize_webpage_prompt
 from app.deep_research.state import ResearchComplete, Summary
 
+logger = logging.getLogger(__name__)
+
+# The configurable models build a new chat model instance per invocation; hand
+# them all one HTTP client so concurrent researchers share a connection pool
+# instead of opening fresh connections for every LLM call
+shared_llm_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=256, max_keepalive_connections=128)
+)
+
+# Token bucket in front of every deep research LLM call. All nodes (research,
+# compression, summarization, final report) go to the same Azure deployment, so
+# they share one bucket; pacing requests up front avoids 429 storms and the
+# backoff tail that follows them when several researchers run concurrently
+shared_llm_rate_limiter = InMemoryRateLimiter(
+    requests_per_second=get_settings().deep_research_llm_rpm / 60,
+    check_every_n_seconds=0.05,
+    max_bucket_size=10,
+)
+
+
+class SummaryCache:
+    """In-process LRU of successfully parsed webpage summaries with hit/miss counters.
+
+    Only results that made it through structured output parsing are stored, so a
+    retry after malformed output always goes back to the model.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[bytes, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_name: str, prompt: str) -> bytes:
+        return hashlib.blake2b(f"{model_name}\0{prompt}".encode(), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        summary = self._entries.get(key)
+        if summary is None:
+            self.misses += 1
+        else:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        logger.debug("Summary cache hits=%d misses=%d", self.hits, self.misses)
+        return summary
+
+    def put(self, key: bytes, summary: str) -> None:
+        self._entries[key] = summary
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+# Overlapping research queries often fetch the same page; reuse its summary
+# instead of issuing the same summarization call again
+summary_cache = SummaryCache(maxsize=1024)
+
 configurable_model = init_chat_model(
     configurable_fields=("model", "max_tokens", "api_key", "azure_endpoint", "api_version", "deployment_name"),
+    http_async_client=shared_llm_http_client,
+    rate_limiter=shared_llm_rate_limiter,
 )
 
 ##########################
@@ -117,7 +182,8 @@ async def tavily_search(
         noop() if not result.get("raw_content") 
         else summarize_webpage(
             summarization_model, 
-            result['raw_content'][:max_char_to_include]
+            result['raw_content'][:max_char_to_include],
+            model_name=configurable.summarization_model
         )
         for result in unique_results.values()
     ]
@@ -188,12 +254,13 @@ async def tavily_search_async(
     search_results = await asyncio.gather(*search_tasks)
     return search_results
 
-async def summarize_webpage(model: BaseChatModel, webpage_content: str) -> str:
+async def summarize_webpage(model: BaseChatModel, webpage_content: str, model_name: Optional[str] = None) -> str:
     """Summarize webpage content using AI model with timeout protection.
     
     Args:
         model: The chat model configured for summarization
         webpage_content: Raw webpage content to be summarized
+        model_name: Summarization model identifier; enables the summary cache when given
         
     Returns:
         Formatted summary with key excerpts, or original content if summarization fails
@@ -205,6 +272,13 @@ async def summarize_webpage(model: BaseChatModel, webpage_content: str) -> str:
             date=get_today_str()
         )
         
+        cache_key = None
+        if model_name is not None:
+            cache_key = SummaryCache.key(model_name, prompt_content)
+            cached_summary = summary_cache.get(cache_key)
+            if cached_summary is not None:
+                return cached_summary
+        
         # Execute summarization with timeout to prevent hanging
         summary = await asyncio.wait_for(
             model.ainvoke([HumanMessage(content=prompt_content)]),
@@ -217,6 +291,9 @@ async def summarize_webpage(model: BaseChatModel, webpage_content: str) -> str:
             f"<key_excerpts>\n{summary.key_excerpts}\n</key_excerpts>"
         )
         
+        if cache_key is not None:
+            summary_cache.put(cache_key, formatted_summary)
+        
         return formatted_summary
         
     except asyncio.TimeoutError:
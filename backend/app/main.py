@@ -85,10 +85,11 @@ logger.info(f"  - allow_headers: ['*']")
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    logger.info(f"Incoming request: {request.method} {request.url}")
-    logger.info(f"Request headers: {dict(request.headers)}")
+    logger.info("Incoming request: %s %s", request.method, request.url)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request headers: %s", dict(request.headers))
     response = await call_next(request)
-    logger.info(f"Response status: {response.status_code}")
+    logger.info("Response status: %s", response.status_code)
     return response
 
 # Include routers
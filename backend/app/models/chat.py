@@ -1,5 +1,5 @@
 from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, Boolean
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from pgvector.sqlalchemy import Vector
@@ -17,14 +17,20 @@ class Chat(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
-    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
+    messages = relationship(
+        "Message",
+        back_populates="chat",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="Message.created_at"
+    )
 
 
 class Message(Base):
     __tablename__ = "messages"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    chat_id = Column(UUID(as_uuid=True), ForeignKey("chats.id"), nullable=False)
+    chat_id = Column(UUID(as_uuid=True), ForeignKey("chats.id", ondelete="CASCADE"), nullable=False)
     content = Column(Text, nullable=False)
     role = Column(String(20), nullable=False)  # 'user' or 'assistant'
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -111,7 +117,7 @@ class DocumentChunk(Base):
     embedding_dim = Column(Integer, nullable=True)
     
     # Chunk metadata (JSON) - can store message_ids for chats, page_num for PDFs, etc.
-    chunk_metadata = Column(Text, nullable=True)  # JSON string for chunk-specific metadata
+    chunk_metadata = Column(JSONB(none_as_null=True), nullable=True)  # JSONB dict for chunk-specific metadata
     
     # Optional summary for this chunk
     summary = Column(Text, nullable=True)
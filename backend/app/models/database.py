@@ -1,13 +1,23 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .base import Base
 from app.config import get_settings
 
-# Global engine and session maker
+_settings = get_settings()
+
+# Global engine and session maker; connections are pooled and checked
+# before use so each chat turn reuses warm connections
 engine = create_async_engine(
-    get_settings().database_url,
+    _settings.database_url,
     echo=True,  # Set to False in production
-    future=True
+    future=True,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=_settings.db_pool_size,
+    max_overflow=_settings.db_max_overflow,
+    pool_timeout=_settings.db_pool_timeout,
+    pool_recycle=_settings.db_pool_recycle,
+    pool_pre_ping=True
 )
 async_session_maker = sessionmaker(
     engine,
@@ -1,7 +1,7 @@
 import asyncio
 import random
 import time
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, List, Optional
 from openai import AsyncAzureOpenAI, RateLimitError
 from openai._exceptions import APIStatusError
 from app.config import get_settings
@@ -31,6 +31,11 @@ class AzureOpenAIService:
     def count_tokens(self, text: str) -> int:
         """Count tokens in text"""
         return len(self.tokenizer.encode(text))
+
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for several texts with one batched tokenizer call"""
+        # Ordinary encoding: user-edited text may contain special tokens like <|endoftext|>
+        return [len(tokens) for tokens in self.tokenizer.encode_ordinary_batch(texts)]
     
     async def _execute_with_retry(self, operation, max_retries: int = 3):
         """Execute an operation with exponential backoff for rate limits"""
@@ -89,7 +94,7 @@ class AzureOpenAIService:
                 # temperature=temperature,
                 max_completion_tokens=max_tokens,
             )
-            print("response", response)
+            logger.debug("response %s", response)
             return response
 
         response = await self._execute_with_retry(_generate)
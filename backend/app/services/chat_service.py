@@ -1,150 +1,413 @@
-from typing import List, Optional, AsyncGenerator, Set
+from typing import List, Optional, AsyncGenerator, Set, AbstractSet
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, desc, insert, update, delete, func, or_
+from sqlalchemy.orm import selectinload, load_only
 from sqlalchemy.sql import text
 import json
+import orjson
 import re
 import asyncio
-from datetime import datetime
+import functools
+import time
+from datetime import datetime, timedelta, timezone
 import logging
 import inspect
 
 from app.models.chat import Chat as ChatModel, Message as MessageModel, Tag, DocumentTag
+from app.config import settings
+from app.models.database import async_session_maker
 from app.schemas.chat import ChatCreate, MessageCreate, ChatListItem, Chat, Message
 from app.services.llm_factory import llm_service
 from app.services.embedding_service import embedding_service
 from app.services.deep_research_service import DeepResearchService
 
+logger = logging.getLogger(__name__)
+
+# Base system prompt for every chat completion
+_BASE_SYSTEM_PROMPT = """You are ChatGPT, a large language model based on the GPT-5 model and trained by OpenAI.
+Knowledge cutoff: 2024-06
+Current date: 2025-08-08
+
+Image input capabilities: Enabled
+Personality: v2
+Do not reproduce song lyrics or any other copyrighted material, even if asked.
+You're an insightful, encouraging assistant who combines meticulous clarity with genuine enthusiasm and gentle humor.
+Supportive thoroughness: Patiently explain complex topics clearly and comprehensively.
+Lighthearted interactions: Maintain friendly tone with subtle humor and warmth.
+Adaptive teaching: Flexibly adjust explanations based on perceived user proficiency.
+Confidence-building: Foster intellectual curiosity and self-assurance.
+
+IMPORTANT: When writing mathematical formulas, equations, or any LaTeX expressions:
+- For display equations (centered, on their own line), use: \\begin{equation} ... \\end{equation}
+- For inline math (within text), use: \\( ... \\)
+- For simple inline math, you can also use: $...$
+- Examples:
+  * Display: \\begin{equation} E = mc^2 \\end{equation}
+  * Inline: The equation \\(E = mc^2\\) shows energy-mass equivalence
+  * Simple inline: The famous $E = mc^2$ equation
+
+CITATION FORMATTING - VERY IMPORTANT:
+When you reference information from the provided knowledge context, use INLINE citations immediately after the relevant claim:
+- Format: "Specific claim or fact[N]" where N is the number of the source
+- Place citations directly after the claim they support, not at the end of sentences or paragraphs
+- Each citation [N] corresponds to the numbered source in the knowledge context
+- Examples:
+  * "Einstein developed the theory of relativity[1] which revolutionized physics[1]."
+  * "The study found that students performed better[2] when using active learning methods[2]."
+  * "Recent research shows[3] that climate change is accelerating[3]."
+- Use citations liberally - every factual claim from the knowledge base should be cited
+- Multiple facts from the same source should each have their own citation: "Fact A[1] and fact B[1]"
+
+Do not end with opt-in questions or hedging closers. Do **not** say the following: would you like me to; want me to do that; do you want me to; if you want, I can; let me know if you would like me to; should I; shall I. Ask at most one necessary clarifying question at the start, not the end. If the next step is obvious, do it.""".rstrip()
+
+# Knowledge-base preambles placed between the base prompt and the retrieved context
+_CONTEXT_PREAMBLE = "\n\nYou have access to a knowledge base. Use the following context if relevant:\n\n"
+_FALLBACK_PREAMBLE = "\n\nYou have access to a knowledge base. The following context was retrieved but may not be highly relevant:\n\n"
+
+# Full system prompt prefixes; per turn only the retrieved context is appended
+_CONTEXT_PROMPT = _BASE_SYSTEM_PROMPT + _CONTEXT_PREAMBLE
+_FALLBACK_PROMPT = _BASE_SYSTEM_PROMPT + _FALLBACK_PREAMBLE
+
+
+def _detect_provider_hint(service) -> str:
+    """Best-effort, lower-cased provider name for the configured llm_service"""
+    try:
+        provider_hint = getattr(service, "provider", "") or service.__class__.__name__ or str(type(service))
+        return str(provider_hint).lower()
+    except Exception:
+        return ""
+
+
+def _messages_to_prompt(messages: List[dict]) -> str:
+    """Flatten chat messages into a single prompt for completion-style interfaces"""
+    return "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+
+
+def _completion_text(res) -> str:
+    """Extract the generated text from a non-streaming completion result"""
+    if isinstance(res, dict):
+        if res.get("choices"):
+            text = res["choices"][0].get("message", {}).get("content")
+        else:
+            text = res.get("response") or res.get("text")
+        return text or json.dumps(res)
+    return str(res)
+
+
+def _single_shot(call, to_prompt: bool = False, retry_with_prompt: bool = False):
+    """Wrap a blocking completion call as a one-chunk async stream.
+
+    The call runs in a worker thread so it does not block the event loop.
+    """
+    async def stream(messages: List[dict]) -> AsyncGenerator[str, None]:
+        try:
+            res = await asyncio.to_thread(call, _messages_to_prompt(messages) if to_prompt else messages)
+        except TypeError:
+            # Some wrappers expect a string prompt instead of OpenAI-style messages
+            if not retry_with_prompt:
+                raise
+            res = await asyncio.to_thread(call, _messages_to_prompt(messages))
+        yield _completion_text(res)
+    return stream
+
+
+def _unsupported(reason: str):
+    """Stream that fails with reason, surfaced to the user like any LLM error"""
+    async def stream(messages: List[dict]) -> AsyncGenerator[str, None]:
+        raise RuntimeError(reason)
+        yield  # unreachable; makes this an async generator
+    return stream
+
+
+def _resolve_llm_stream(service):
+    """Pick the best interface on service once and return it as messages -> async text stream"""
+    provider_hint = _detect_provider_hint(service)
+    is_langchain = any(k in provider_hint for k in ("langchain", "ollama", "langchainollama"))
+    is_openai_like = any(k in provider_hint for k in ("openai", "azure", "azure_openai", "gpt"))
+    logger.info("LLM provider hint: %s (langchain=%s, openai_like=%s)", provider_hint, is_langchain, is_openai_like)
+
+    # Preferred: async generator named generate_chat_completion
+    gen = getattr(service, "generate_chat_completion", None)
+    if gen and inspect.isasyncgenfunction(gen):
+        logger.info("Using async generator llm_service.generate_chat_completion")
+        return gen
+
+    if is_langchain:
+        # Chat completion first (supports messages format), then generate with a prompt
+        chat_completion = getattr(service, "generate_chat_completion", None)
+        if callable(chat_completion):
+            logger.info("Using LangChain-like llm_service.generate_chat_completion")
+            return _single_shot(chat_completion)
+        sync_gen = getattr(service, "generate", None)
+        if callable(sync_gen):
+            logger.info("Using LangChain-like llm_service.generate")
+            return _single_shot(sync_gen, to_prompt=True)
+        fallback = getattr(service, "call", None) or getattr(service, "run", None)
+        if callable(fallback):
+            return _single_shot(fallback)
+        return _unsupported("No usable LangChain interface found on llm_service")
+
+    if is_openai_like:
+        create_stream = getattr(service, "stream_chat_completion", None) or getattr(service, "stream", None)
+        if create_stream and inspect.isasyncgenfunction(create_stream):
+            logger.info("Using async streaming interface on llm_service")
+            return create_stream
+        create = (
+            getattr(service, "create_chat_completion", None)
+            or getattr(service, "generate", None)
+            or getattr(service, "chat_completion", None)
+        )
+        if callable(create):
+            return _single_shot(create, retry_with_prompt=True)
+        return _unsupported("No usable OpenAI/Azure interface found on llm_service")
+
+    # Unknown provider: generic completion with a prompt
+    if callable(getattr(service, "generate", None)):
+        return _single_shot(service.generate, to_prompt=True)
+    return _unsupported("llm_service does not expose a supported interface")
+
+
+# Resolve the provider interface once; llm_service is fixed at import
+_llm_stream = _resolve_llm_stream(llm_service)
+
+
+# Message parsing patterns, compiled once
+_SYSTEM_CONTEXT_RE = re.compile(r'<system_context>.*?</system_context>\s*\n*', re.DOTALL)
+# #tagname | [tag:tagname]
+_TAG_RE = re.compile(r'#([\w-]+)|\[tag:([\w-]+)\]')
+# /doc "Document Name" (also /document)
+_DOC_QUOTED_RE = re.compile(r'/(?:doc|document)\s+"([^"]+)"')
+# /doc DocumentName (single word, also /document)
+_DOC_UNQUOTED_RE = re.compile(r'/(?:doc|document)\s+([^\s]+)')
+# Inline citations like [1], [2], etc.
+_CITATION_RE = re.compile(r'\[(\d+)\]')
+
+
+def _link_citation(link_targets: dict, match: re.Match) -> str:
+    """_CITATION_RE callback: [N] -> [[N]](url "title"), or unchanged if N is unknown"""
+    link_target = link_targets.get(int(match.group(1)))
+    if link_target is None:
+        return match.group(0)
+    return "[" + match.group(0) + "]" + link_target
+
+# Strong references to fire-and-forget tasks so they are not garbage collected
+_background_tasks: Set[asyncio.Task] = set()
+
+# Upper bound on deep research runs executing at the same time
+_DEEP_RESEARCH_MAX_CONCURRENT = 4
+_deep_research_semaphore = asyncio.Semaphore(_DEEP_RESEARCH_MAX_CONCURRENT)
+
+# Streamed LLM chunks are forwarded in batches of this many chunks, or sooner
+# once this many seconds have passed since the last flush
+_STREAM_BATCH_CHUNKS = 32
+_STREAM_BATCH_SECONDS = 0.05
+
+
+async def _batched_stream(stream: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+    """Coalesce small streamed chunks (often 1-4 characters) into larger batches"""
+    buffer = []
+    last_flush = time.monotonic()
+    try:
+        async for chunk in stream:
+            buffer.append(chunk)
+            now = time.monotonic()
+            if len(buffer) >= _STREAM_BATCH_CHUNKS or now - last_flush > _STREAM_BATCH_SECONDS:
+                yield "".join(buffer)
+                buffer.clear()
+                last_flush = now
+    except Exception:
+        # Deliver what the client would have seen unbatched before the error
+        if buffer:
+            yield "".join(buffer)
+        raise
+    if buffer:
+        yield "".join(buffer)
+
 
 class ChatService:
     @staticmethod
     def strip_system_context_tags(content: str) -> str:
         """Remove system context tags from content for frontend display"""
-        import re
+        # Most messages carry no system context; skip the regex for those
+        if '<system_context>' not in content:
+            return content.strip()
         # Remove <system_context>...</system_context> tags and their content
-        pattern = r'<system_context>.*?</system_context>\s*\n*'
-        return re.sub(pattern, '', content, flags=re.DOTALL).strip()
+        return _SYSTEM_CONTEXT_RE.sub('', content).strip()
     
     @staticmethod
     def extract_tags_from_message(message: str) -> Set[str]:
         """Extract tag references from a message (e.g., #tagname or [tag:tagname])"""
-        tags = set()
-        
-        # Pattern 1: #tagname (alphanumeric and underscore, dash)
-        hashtag_pattern = r'#([\w-]+)'
-        tags.update(re.findall(hashtag_pattern, message))
-        
-        # Pattern 2: [tag:tagname]
-        bracket_pattern = r'\[tag:([\w-]+)\]'
-        tags.update(re.findall(bracket_pattern, message))
-        
-        return tags
+        # Single scan; exactly one of the two groups is set per match
+        return {m.group(1) or m.group(2) for m in _TAG_RE.finditer(message)}
     
     @staticmethod
     def extract_document_references_from_message(message: str) -> Set[str]:
         """Extract document references from a message (e.g., /doc "Document Name" or /doc DocumentName)"""
-        documents = set()
-        
-        # Pattern 1: /doc "Document Name" or /document "Document Name"
-        quoted_pattern = r'/(?:doc|document)\s+"([^"]+)"'
-        documents.update(re.findall(quoted_pattern, message))
-        
-        # Pattern 2: /doc DocumentName or /document DocumentName (single word)
-        unquoted_pattern = r'/(?:doc|document)\s+([^\s]+)'
-        unquoted_matches = re.findall(unquoted_pattern, message)
-        # Filter out matches that are already quoted (to avoid duplicates)
-        for match in unquoted_matches:
-            if not match.startswith('"'):
-                documents.add(match)
-        
+        documents = set(_DOC_QUOTED_RE.findall(message))
+        # Unquoted matches starting with a quote belong to the quoted pattern
+        documents.update(m for m in _DOC_UNQUOTED_RE.findall(message) if not m.startswith('"'))
         return documents
     
     @staticmethod
-    async def get_tag_ids_by_names(db: AsyncSession, tag_names: Set[str]) -> List[UUID]:
+    def extract_references_from_message(message: str) -> tuple[Set[str], Set[str]]:
+        """Extract tag and document references from a message"""
+        return (
+            ChatService.extract_tags_from_message(message),
+            ChatService.extract_document_references_from_message(message),
+        )
+    
+    @staticmethod
+    async def get_tag_ids_by_names(db: AsyncSession, tag_names: AbstractSet[str]) -> List[UUID]:
         """Get tag IDs from tag names"""
         if not tag_names:
             return []
 
-        # Convert to lowercase for case-insensitive matching
+        # Case-insensitive matching via the lower(name) functional index
         lower_names = [name.lower() for name in tag_names]
 
         result = await db.execute(
-            select(Tag.id).where(
-                Tag.name.in_(tag_names) |
-                Tag.name.in_(lower_names)
-            )
+            select(Tag.id).where(func.lower(Tag.name).in_(lower_names))
         )
         return list(result.scalars().all())
     
     @staticmethod
-    async def get_document_ids_by_titles(db: AsyncSession, document_titles: Set[str]) -> List[UUID]:
+    async def get_document_ids_by_titles(db: AsyncSession, document_titles: AbstractSet[str]) -> List[UUID]:
         """Get document IDs from document titles"""
         if not document_titles:
             return []
 
         from app.models.chat import Document
-        from sqlalchemy import func, or_
 
-        # Build conditions for case-insensitive matching on both title and filename
-        conditions = []
-        for title in document_titles:
-            conditions.extend([
-                func.lower(Document.title) == title.lower(),
-                func.lower(Document.filename) == title.lower()
-            ])
+        # Case-insensitive matching on both title and filename via lower(...) functional indexes
+        lower_titles = [title.lower() for title in document_titles]
 
         result = await db.execute(
             select(Document.id).where(
-                or_(*conditions)
+                or_(
+                    func.lower(Document.title).in_(lower_titles),
+                    func.lower(Document.filename).in_(lower_titles)
+                )
             )
         )
         return list(result.scalars().all())
+
+    @staticmethod
+    async def resolve_tag_and_document_ids(
+        tag_names: AbstractSet[str],
+        document_titles: AbstractSet[str],
+        session_factory=async_session_maker
+    ) -> tuple[List[UUID], List[UUID]]:
+        """Resolve tag names and document titles concurrently.
+
+        AsyncSession is not safe for concurrent use, so each lookup runs on
+        its own short-lived session from session_factory.
+        """
+        async def _resolve(resolver, names: AbstractSet[str]) -> List[UUID]:
+            if not names:
+                return []
+            async with session_factory() as session:
+                return await resolver(session, names)
+
+        tag_ids, document_ids = await asyncio.gather(
+            _resolve(ChatService.get_tag_ids_by_names, tag_names),
+            _resolve(ChatService.get_document_ids_by_titles, document_titles)
+        )
+        return tag_ids, document_ids
+
     @staticmethod
     async def create_chat(db: AsyncSession, chat_data: ChatCreate) -> Chat:
         """Create a new chat"""
-        db_chat = ChatModel(title=chat_data.title)
-        db.add(db_chat)
+        result = await db.execute(
+            insert(ChatModel)
+            .values(title=chat_data.title)
+            .returning(ChatModel)
+        )
+        db_chat = result.scalar_one()
         await db.commit()
-        await db.refresh(db_chat)
         return db_chat
     
     @staticmethod
     async def get_chat(db: AsyncSession, chat_id: UUID) -> Optional[Chat]:
         """Get a chat by ID with messages"""
+        # Only the columns callers read; skips each message's embedding vector
+        # and the JSON/deep research columns
         result = await db.execute(
             select(ChatModel)
-            .options(selectinload(ChatModel.messages))
+            .options(
+                selectinload(ChatModel.messages).load_only(
+                    MessageModel.id,
+                    MessageModel.chat_id,
+                    MessageModel.content,
+                    MessageModel.role,
+                    MessageModel.created_at,
+                    MessageModel.token_count
+                )
+            )
             .where(ChatModel.id == chat_id)
         )
         return result.scalar_one_or_none()
     
+    @staticmethod
+    async def _get_recent_messages(db: AsyncSession, chat_id: UUID, n: Optional[int] = None) -> List[MessageModel]:
+        """Get the last n messages of a chat (all of them if n is falsy) in chronological order"""
+        # The prompt only needs role and content
+        stmt = (
+            select(MessageModel)
+            .options(load_only(MessageModel.role, MessageModel.content, MessageModel.created_at))
+            .where(MessageModel.chat_id == chat_id)
+        )
+        if not n:
+            result = await db.execute(stmt.order_by(MessageModel.created_at))
+            return list(result.scalars().all())
+        result = await db.execute(stmt.order_by(MessageModel.created_at.desc()).limit(n))
+        return list(reversed(result.scalars().all()))
+    
+    @staticmethod
+    async def _get_chat_messages(db: AsyncSession, chat_id: UUID) -> List[MessageModel]:
+        """Get all messages of a chat in chronological order"""
+        result = await db.execute(
+            select(MessageModel)
+            .where(MessageModel.chat_id == chat_id)
+            .order_by(MessageModel.created_at)
+        )
+        return list(result.scalars().all())
+    
     @staticmethod
     async def get_chats(db: AsyncSession, limit: int = 50) -> List[ChatListItem]:
         """Get all chats with basic info"""
-        # Get chats with their latest message
+        # Get the page of chats first, then their latest message via a lateral
+        # lookup on the (chat_id, created_at DESC) index and their message
+        # counts via one grouped aggregate restricted to that page
         query = """
+        WITH recent_chats AS (
+            SELECT id, title, created_at, updated_at
+            FROM chats
+            ORDER BY updated_at DESC
+            LIMIT :limit
+        )
         SELECT
             c.id,
             c.title,
             c.created_at,
             c.updated_at,
-            (
-                SELECT m.content
-                FROM messages m
-                WHERE m.chat_id = c.id
-                ORDER BY m.created_at DESC
-                LIMIT 1
-            ) as last_message,
-            (
-                SELECT COUNT(*)
-                FROM messages m
-                WHERE m.chat_id = c.id
-            ) as message_count
-        FROM chats c
+            lm.content AS last_message,
+            COALESCE(mc.cnt, 0) AS message_count
+        FROM recent_chats c
+        LEFT JOIN LATERAL (
+            SELECT m.content
+            FROM messages m
+            WHERE m.chat_id = c.id
+            ORDER BY m.created_at DESC
+            LIMIT 1
+        ) lm ON true
+        LEFT JOIN (
+            SELECT chat_id, COUNT(*) AS cnt
+            FROM messages
+            WHERE chat_id IN (SELECT id FROM recent_chats)
+            GROUP BY chat_id
+        ) mc ON mc.chat_id = c.id
         ORDER BY c.updated_at DESC
-        LIMIT :limit
         """
 
         result = await db.execute(text(query), {"limit": limit})
@@ -165,11 +428,33 @@ class ChatService:
     @staticmethod
     async def update_chat(db: AsyncSession, chat_id: UUID, chat_data) -> Optional[Chat]:
         """Update a chat's title and/or messages"""
+        if chat_data.messages is None:
+            # Title-only (or empty) update: no need to load the chat first
+            if chat_data.title is not None:
+                result = await db.execute(
+                    update(ChatModel)
+                    .where(ChatModel.id == chat_id)
+                    .values(title=chat_data.title)
+                    .returning(ChatModel)
+                    .execution_options(populate_existing=True)
+                )
+                chat = result.scalar_one_or_none()
+                await db.commit()
+            else:
+                chat = await db.get(ChatModel, chat_id)
+            
+            if not chat:
+                return None
+            
+            messages = await ChatService._get_chat_messages(db, chat_id)
+            return ChatService._to_chat_schema(chat, messages)
+        
         # Get the chat
         result = await db.execute(
             select(ChatModel)
             .options(selectinload(ChatModel.messages))
             .where(ChatModel.id == chat_id)
+            .execution_options(populate_existing=True)
         )
         chat = result.scalar_one_or_none()
         
@@ -180,28 +465,109 @@ class ChatService:
         if chat_data.title is not None:
             chat.title = chat_data.title
         
-        # Update messages if provided
+        # Update messages if provided, writing only the delta against what is stored
+        messages = chat.messages
         if chat_data.messages is not None:
-            # Delete existing messages
-            await db.execute(
-                text("DELETE FROM messages WHERE chat_id = :chat_id"),
-                {"chat_id": str(chat_id)}
+            existing = {msg.id: msg for msg in chat.messages}
+            kept_ids = set()
+            new_rows = []
+            changed = []  # existing rows whose content changed
+            messages = []  # payload order; dicts are rows inserted below
+            for msg_data in chat_data.messages:
+                content = msg_data.get('content', '')
+                role = msg_data.get('role', 'user')
+                try:
+                    msg_id = UUID(str(msg_data['id'])) if msg_data.get('id') else None
+                except ValueError:
+                    msg_id = None
+                
+                db_message = existing.get(msg_id)
+                if db_message is not None and msg_id not in kept_ids:
+                    kept_ids.add(msg_id)
+                    if db_message.content != content or db_message.role != role:
+                        # Flushed as an UPDATE on commit
+                        db_message.content = content
+                        db_message.role = role
+                        changed.append(db_message)
+                    messages.append(db_message)
+                else:
+                    row = {
+                        "chat_id": chat_id,
+                        "content": content,
+                        "role": role
+                    }
+                    new_rows.append(row)
+                    messages.append(row)
+            
+            ChatService._stamp_in_payload_order(messages)
+            
+            # Count tokens for every changed or new message in one batch
+            token_counts = llm_service.count_tokens_batch(
+                [msg.content for msg in changed] + [row["content"] for row in new_rows]
             )
+            for db_message, token_count in zip(changed, token_counts):
+                db_message.token_count = token_count
+            for row, token_count in zip(new_rows, token_counts[len(changed):]):
+                row["token_count"] = token_count
             
-            # Add new messages
-            for idx, msg_data in enumerate(chat_data.messages):
-                message = MessageModel(
-                    chat_id=chat_id,
-                    content=msg_data.get('content', ''),
-                    role=msg_data.get('role', 'user'),
-                    token_count=len(msg_data.get('content', '').split())  # Simple token count
+            # Delete messages missing from the payload in one statement
+            removed_ids = existing.keys() - kept_ids
+            if removed_ids:
+                await db.execute(
+                    delete(MessageModel).where(MessageModel.id.in_(removed_ids))
                 )
-                db.add(message)
+            
+            # Add new messages in a single INSERT ... RETURNING
+            if new_rows:
+                result = await db.scalars(
+                    insert(MessageModel).returning(MessageModel, sort_by_parameter_order=True),
+                    new_rows
+                )
+                inserted = iter(result.all())
+                messages = [next(inserted) if isinstance(msg, dict) else msg for msg in messages]
         
         await db.commit()
-        await db.refresh(chat)
+        if chat_data.title is not None:
+            # Title change fires onupdate for updated_at
+            await db.refresh(chat, ["updated_at"])
         
         # Return the updated chat with messages
+        return ChatService._to_chat_schema(chat, messages)
+    
+    @staticmethod
+    def _stamp_in_payload_order(messages: list) -> None:
+        """Give edited chat messages strictly increasing created_at in payload order.
+
+        Messages are read back ordered by created_at, so new rows (dicts) get an
+        explicit timestamp between their neighbours instead of the server's now(),
+        which would put them after every existing message and tie within the batch.
+        Kept messages keep their timestamp unless the payload moved them out of order.
+        """
+        step = timedelta(microseconds=1)
+        # Leading new rows go just before the first kept message
+        first_kept = next(
+            (i for i, msg in enumerate(messages) if not isinstance(msg, dict) and msg.created_at),
+            None
+        )
+        if first_kept is None:
+            start = datetime.now(timezone.utc)
+            first_kept = 0
+        else:
+            start = messages[first_kept].created_at
+        
+        prev = start - step * (first_kept + 1)
+        for msg in messages:
+            if isinstance(msg, dict):
+                prev = msg["created_at"] = prev + step
+            elif msg.created_at is not None and msg.created_at > prev:
+                prev = msg.created_at
+            else:
+                # Flushed as an UPDATE on commit
+                prev = msg.created_at = prev + step
+    
+    @staticmethod
+    def _to_chat_schema(chat: ChatModel, messages: List[MessageModel]) -> Chat:
+        """Build the Chat response, with system context stripped from message content"""
         return Chat(
             id=chat.id,
             title=chat.title,
@@ -216,23 +582,19 @@ class ChatService:
                     created_at=msg.created_at,
                     token_count=msg.token_count
                 )
-                for msg in chat.messages
+                for msg in messages
             ]
         )
     
     @staticmethod
     async def delete_chat(db: AsyncSession, chat_id: UUID) -> bool:
         """Delete a chat and all its messages"""
+        # Messages go with it through the ON DELETE CASCADE foreign key
         result = await db.execute(
-            select(ChatModel).where(ChatModel.id == chat_id)
+            delete(ChatModel).where(ChatModel.id == chat_id)
         )
-        chat = result.scalar_one_or_none()
-        
-        if chat:
-            await db.delete(chat)
-            await db.commit()
-            return True
-        return False
+        await db.commit()
+        return result.rowcount > 0
     
     @staticmethod
     async def add_message(
@@ -244,25 +606,25 @@ class ChatService:
         # Count tokens
         token_count = llm_service.count_tokens(message_data.content)
         
-        db_message = MessageModel(
-            chat_id=chat_id,
-            content=message_data.content,
-            role=message_data.role,
-            token_count=token_count
+        result = await db.execute(
+            insert(MessageModel)
+            .values(
+                chat_id=chat_id,
+                content=message_data.content,
+                role=message_data.role,
+                token_count=token_count
+            )
+            .returning(MessageModel)
         )
+        db_message = result.scalar_one()
         
-        db.add(db_message)
-        await db.commit()
-        await db.refresh(db_message)
-        
-        # Update chat's updated_at timestamp
+        # Bump the chat's updated_at in the same transaction
         await db.execute(
-            select(ChatModel).where(ChatModel.id == chat_id)
+            update(ChatModel)
+            .where(ChatModel.id == chat_id)
+            .values(updated_at=func.now())
         )
-        chat_result = await db.execute(select(ChatModel).where(ChatModel.id == chat_id))
-        chat = chat_result.scalar_one_or_none()
-        if chat:
-            await db.commit()  # This will trigger the onupdate for updated_at
+        await db.commit()
         
         return db_message
     
@@ -280,34 +642,40 @@ class ChatService:
         max_react_tool_calls: int = 1,
         max_structured_output_retries: int = 1
     ) -> AsyncGenerator[tuple[str, Optional[UUID]], None]:
-        """Generate AI response for a chat message with optional RAG support"""
-        logger = logging.getLogger(__name__)
+        """Generate AI response for a chat message with optional RAG support.
 
-        # Get chat with messages for context
-        chat = await ChatService.get_chat(db, chat_id)
-        if not chat:
-            raise ValueError("Chat not found")
-        
-        # Add user message (store original without system context tags)
-        user_msg = await ChatService.add_message(
-            db, 
-            chat_id, 
-            MessageCreate(content=user_message, role="user")
+        The caller must have validated that the chat exists (see get_or_create_chat).
+        """
+        # Extract tag and document references from user message and resolve them
+        # on their own sessions while the history is loaded and the user message stored
+        tag_names, document_titles = ChatService.extract_references_from_message(user_message)
+        references_task = asyncio.create_task(
+            ChatService.resolve_tag_and_document_ids(tag_names, document_titles)
         )
-        
-        # Extract tags from user message
-        tag_names = ChatService.extract_tags_from_message(user_message)
-        tag_ids = await ChatService.get_tag_ids_by_names(db, tag_names) if tag_names else []
-        
-        # Extract document references from user message
-        document_titles = ChatService.extract_document_references_from_message(user_message)
-        document_ids = await ChatService.get_document_ids_by_titles(db, document_titles) if document_titles else []
+
+        try:
+            # Load recent history for context before the new user message is stored;
+            # the caller has already validated that the chat exists
+            history = await ChatService._get_recent_messages(db, chat_id, settings.chat_history_limit)
+            
+            # Add user message (store original without system context tags)
+            user_msg = await ChatService.add_message(
+                db, 
+                chat_id, 
+                MessageCreate(content=user_message, role="user")
+            )
+        except BaseException:
+            references_task.cancel()
+            raise
+
+        tag_ids, document_ids = await references_task
         
         # Perform similarity search to retrieve relevant context if RAG is enabled
         relevant_chunks = []
+        using_fallback = False
         if use_rag:
             try:
-                relevant_chunks = await embedding_service.similarity_search(
+                relevant_chunks, using_fallback = await embedding_service.similarity_search(
                     db=db,
                     query=user_message,
                     limit=rag_limit,
@@ -315,7 +683,7 @@ class ChatService:
                     tag_ids=tag_ids if tag_ids else None,
                     document_ids=document_ids if document_ids else None
                 )
-                logger.debug("RAG relevant_chunks: %s", relevant_chunks)
+                logger.debug("RAG chunks=%d using_fallback=%s", len(relevant_chunks), using_fallback)
                 if tag_names:
                     logger.debug("Filtered by tags: %s -> %s", tag_names, tag_ids)
                 if document_titles:
@@ -323,165 +691,122 @@ class ChatService:
             except Exception as e:
                 logger.warning("RAG similarity search failed, continuing without RAG: %s", e)
                 relevant_chunks = []
+                using_fallback = False
         
-        # Build context from retrieved chunks and prepare citation mapping
+        # Build context from retrieved chunks and prepare citation mapping and
+        # per-document stats in a single pass
         context_parts = []
         chunk_to_citation_mapping = {}  # Maps citation numbers to chunk details
+        doc_stats = {}  # Per-document aggregation for document references
         
         if relevant_chunks:
-            threshold_distance = 1.0 - rag_threshold
-            using_fallback = all(getattr(chunk, 'search_distance', 0) >= threshold_distance for chunk in relevant_chunks)
-            
             if using_fallback:
                 context_parts.append("## Related Knowledge from Database (Less Relevant):\n")
                 context_parts.append("*Note: No highly relevant matches found. The following are the closest available documents:*\n\n")
             else:
                 context_parts.append("## Relevant Knowledge from Database:\n")
             
+            # One rendered entry per chunk; joined once below
+            context_entries = []
+            add_entry = context_entries.append
             for i, chunk in enumerate(relevant_chunks, 1):
-                metadata = json.loads(chunk.chunk_metadata) if chunk.chunk_metadata else {}
-                source_info = f"[Source: {getattr(chunk, 'document_title', 'Unknown')}]"
-                distance = getattr(chunk, 'search_distance', 'unknown')
-                
-                if isinstance(distance, float):
-                    confidence = f" (Similarity: {(1.0 - distance) * 100:.1f}%)"
-                else:
-                    confidence = ""
+                # similarity_search always sets the search attributes on its chunks
+                metadata = chunk.chunk_metadata or {}
+                content = chunk.content
+                chunk_id = str(chunk.id)
+                document_title = chunk.document_title or 'Unknown'
+                distance = chunk.search_distance
+                has_distance = distance is not None
+                similarity = 1.0 - distance if has_distance else 0.0
+                content_preview = content[:200] + '...' if len(content) > 200 else content
+                page_number = metadata.get('page_number')
                 
                 # Store citation mapping for later use
                 chunk_to_citation_mapping[i] = {
-                    'chunk_id': str(chunk.id),
+                    'chunk_id': chunk_id,
                     'document_id': str(chunk.document_id),
-                    'document_title': getattr(chunk, 'document_title', 'Unknown'),
+                    'document_title': document_title,
                     'chunk_index': chunk.chunk_index,
-                    'page_number': metadata.get('page_number'),
-                    'similarity': 1.0 - distance if isinstance(distance, float) else 0.0,
-                    'content_preview': chunk.content[:200] + '...' if len(chunk.content) > 200 else chunk.content
+                    'page_number': page_number,
+                    'similarity': similarity,
+                    'content_preview': content_preview
                 }
                 
-                context_parts.append(f"{i}. {source_info}{confidence}\n{chunk.content}\n")
+                confidence = " (Similarity: %.1f%%)" % (similarity * 100) if has_distance else ""
+                add_entry("%d. [Source: %s]%s\n%s\n" % (i, document_title, confidence, content))
+
+                doc_id = str(chunk.document_id) if chunk.document_id else None
+                if doc_id:
+                    if doc_id not in doc_stats:
+                        doc_stats[doc_id] = {
+                            'id': doc_id,
+                            'title': document_title,
+                            'source_type': chunk.source_type or 'unknown',
+                            'max_similarity': similarity,
+                            'sum_similarity': 0.0,
+                            'chunk_count': 0,
+                            'chunks_used': []  # NEW: Store individual chunk details
+                        }
+                    stats = doc_stats[doc_id]
+                    chunk_start = metadata.get('chunk_start_char')
+                    stats['chunk_count'] += 1
+                    if similarity > stats['max_similarity']:
+                        stats['max_similarity'] = similarity
+                    stats['sum_similarity'] += similarity
+
+                    # Add chunk details for highlighting
+                    stats['chunks_used'].append({
+                        'chunk_id': chunk_id,
+                        'chunk_index': chunk.chunk_index,
+                        'page_number': page_number,
+                        'page_index': metadata.get('page_index'),
+                        'text_position': {
+                            'start': chunk_start,
+                            'end': metadata.get('chunk_end_char')
+                        } if chunk_start is not None else None,
+                        'similarity': similarity,
+                        'content_preview': content_preview
+                    })
             
-            context_parts.append("\n---\n\nIMPORTANT: When citing information from these sources, use the format [N] where N is the source number (1-{len(relevant_chunks)}). Each citation should be placed immediately after the claim it supports.\n\n")
+            context_parts.append("".join(context_entries))
+            context_parts.append(f"\n---\n\nIMPORTANT: When citing information from these sources, use the format [N] where N is the source number (1-{len(relevant_chunks)}). Each citation should be placed immediately after the claim it supports.\n\n")
         
         # Build conversation history for LLM call
         messages = []
-        for msg in sorted(chat.messages[:-1], key=lambda x: x.created_at):
+        for msg in history:
             messages.append({"role": msg.role, "content": msg.content})
         
-        # Base system prompt (kept as before)
-        base_prompt = """You are ChatGPT, a large language model based on the GPT-5 model and trained by OpenAI.
-Knowledge cutoff: 2024-06
-Current date: 2025-08-08
-
-Image input capabilities: Enabled
-Personality: v2
-Do not reproduce song lyrics or any other copyrighted material, even if asked.
-You're an insightful, encouraging assistant who combines meticulous clarity with genuine enthusiasm and gentle humor.
-Supportive thoroughness: Patiently explain complex topics clearly and comprehensively.
-Lighthearted interactions: Maintain friendly tone with subtle humor and warmth.
-Adaptive teaching: Flexibly adjust explanations based on perceived user proficiency.
-Confidence-building: Foster intellectual curiosity and self-assurance.
-
-IMPORTANT: When writing mathematical formulas, equations, or any LaTeX expressions:
-- For display equations (centered, on their own line), use: \\begin{equation} ... \\end{equation}
-- For inline math (within text), use: \\( ... \\)
-- For simple inline math, you can also use: $...$
-- Examples:
-  * Display: \\begin{equation} E = mc^2 \\end{equation}
-  * Inline: The equation \\(E = mc^2\\) shows energy-mass equivalence
-  * Simple inline: The famous $E = mc^2$ equation
-
-CITATION FORMATTING - VERY IMPORTANT:
-When you reference information from the provided knowledge context, use INLINE citations immediately after the relevant claim:
-- Format: "Specific claim or fact[N]" where N is the number of the source
-- Place citations directly after the claim they support, not at the end of sentences or paragraphs
-- Each citation [N] corresponds to the numbered source in the knowledge context
-- Examples:
-  * "Einstein developed the theory of relativity[1] which revolutionized physics[1]."
-  * "The study found that students performed better[2] when using active learning methods[2]."
-  * "Recent research shows[3] that climate change is accelerating[3]."
-- Use citations liberally - every factual claim from the knowledge base should be cited
-- Multiple facts from the same source should each have their own citation: "Fact A[1] and fact B[1]"
-
-Do not end with opt-in questions or hedging closers. Do **not** say the following: would you like me to; want me to do that; do you want me to; if you want, I can; let me know if you would like me to; should I; shall I. Ask at most one necessary clarifying question at the start, not the end. If the next step is obvious, do it."""
         
         # Construct full system/context message when applicable
         if context_parts:
-            if all(getattr(chunk, 'search_distance', 0) >= (1.0 - rag_threshold) for chunk in relevant_chunks):
-                context_message = base_prompt + "\n\n" + "You have access to a knowledge base. The following context was retrieved but may not be highly relevant:\n\n" + "".join(context_parts)
-            else:
-                context_message = base_prompt + "\n\n" + "You have access to a knowledge base. Use the following context if relevant:\n\n" + "".join(context_parts)
+            prompt_prefix = _FALLBACK_PROMPT if using_fallback else _CONTEXT_PROMPT
+            context_message = "".join((prompt_prefix, *context_parts))
             # prefer system role if supported by provider; we still append to messages so all providers see it
             messages.insert(0, {"role": "system", "content": context_message})
         else:
-            messages.insert(0, {"role": "system", "content": base_prompt})
+            messages.insert(0, {"role": "system", "content": _BASE_SYSTEM_PROMPT})
         
         # Add current user message
         messages.append({"role": "user", "content": user_message})
         
-        # Prepare document references structure
-        document_references = []
-        if relevant_chunks:
-            doc_stats = {}
-            for chunk in relevant_chunks:
-                doc_id = str(chunk.document_id) if hasattr(chunk, 'document_id') else None
-                if doc_id and doc_id not in doc_stats:
-                    doc_stats[doc_id] = {
-                        'id': doc_id,
-                        'title': getattr(chunk, 'document_title', 'Unknown'),
-                        'source_type': getattr(chunk, 'source_type', 'unknown'),
-                        'similarities': [],
-                        'chunk_count': 0,
-                        'chunks_used': []  # NEW: Store individual chunk details
-                    }
-                if doc_id:
-                    doc_stats[doc_id]['chunk_count'] += 1
-                    distance = getattr(chunk, 'search_distance', 0)
-                    similarity = 1.0 - distance if distance is not None else 0.0
-                    doc_stats[doc_id]['similarities'].append(similarity)
-
-                    # Parse chunk metadata to get page info
-                    chunk_meta = json.loads(chunk.chunk_metadata) if chunk.chunk_metadata else {}
-
-                    # Add chunk details for highlighting
-                    doc_stats[doc_id]['chunks_used'].append({
-                        'chunk_id': str(chunk.id),
-                        'chunk_index': chunk.chunk_index,
-                        'page_number': chunk_meta.get('page_number'),
-                        'page_index': chunk_meta.get('page_index'),
-                        'text_position': {
-                            'start': chunk_meta.get('chunk_start_char'),
-                            'end': chunk_meta.get('chunk_end_char')
-                        } if chunk_meta.get('chunk_start_char') is not None else None,
-                        'similarity': similarity,
-                        'content_preview': chunk.content[:200] + '...' if len(chunk.content) > 200 else chunk.content
-                    })
-            for doc_data in doc_stats.values():
-                if doc_data['similarities']:
-                    document_references.append({
-                        'id': doc_data['id'],
-                        'title': doc_data['title'],
-                        'source_type': doc_data['source_type'],
-                        'chunk_count': doc_data['chunk_count'],
-                        'max_similarity': max(doc_data['similarities']),
-                        'avg_similarity': sum(doc_data['similarities']) / len(doc_data['similarities']),
-                        'chunks_used': doc_data['chunks_used'],  # NEW: Include chunk details
-                        'tags': []  # TODO: Add tags in future iteration
-                    })
-        
-        # Determine provider type (best-effort detection)
-        provider_hint = ""
-        try:
-            provider_hint = getattr(llm_service, "provider", "") or llm_service.__class__.__name__ or str(type(llm_service))
-            provider_hint = str(provider_hint).lower()
-        except Exception:
-            provider_hint = ""
-        is_langchain = any(k in provider_hint for k in ("langchain", "ollama", "langchainollama"))
-        is_openai_like = any(k in provider_hint for k in ("openai", "azure", "azure_openai", "gpt"))
-        logger.debug("LLM provider hint: %s (langchain=%s, openai_like=%s)", provider_hint, is_langchain, is_openai_like)
+        # Prepare document references structure from the per-document stats
+        document_references = [
+            {
+                'id': doc_data['id'],
+                'title': doc_data['title'],
+                'source_type': doc_data['source_type'],
+                'chunk_count': doc_data['chunk_count'],
+                'max_similarity': doc_data['max_similarity'],
+                'avg_similarity': doc_data['sum_similarity'] / doc_data['chunk_count'],
+                'chunks_used': doc_data['chunks_used'],  # NEW: Include chunk details
+                'tags': []  # TODO: Add tags in future iteration
+            }
+            for doc_data in doc_stats.values()
+        ]
         
-        # Generate response: try several interfaces in preference order, with clear logging
-        response_content = ""
+        # Generate response through the provider interface resolved at import
+        # Collected response pieces, joined once after streaming
+        response_parts = []
 
         if use_deep_research:
             # Unified approach: Create assistant message immediately with "running" status
@@ -500,203 +825,104 @@ Do not end with opt-in questions or hedging closers. Do **not** say the followin
                 MessageCreate(content="Deep research in progress...", role="assistant")
             )
 
-            # Update with deep research specific fields
-            result = await db.execute(
-                select(MessageModel).where(MessageModel.id == assistant_msg.id)
+            # Update with deep research specific fields; the row was just
+            # inserted, so there is no need to select it back first
+            await db.execute(
+                update(MessageModel)
+                .where(MessageModel.id == assistant_msg.id)
+                .values(
+                    is_deep_research=True,
+                    deep_research_status="running",
+                    deep_research_params=orjson.dumps(deep_research_params).decode()
+                )
             )
-            db_message = result.scalar_one_or_none()
-            if db_message:
-                db_message.is_deep_research = True
-                db_message.deep_research_status = "running"
-                db_message.deep_research_params = json.dumps(deep_research_params)
-                await db.commit()
+            await db.commit()
 
-            # Start deep research in background (fire and forget)
-            asyncio.create_task(ChatService._run_deep_research_background(
-                db, assistant_msg.id, user_message, deep_research_params
+            # Start deep research in background (fire and forget) on its own session
+            task = asyncio.create_task(ChatService._run_deep_research_background(
+                async_session_maker, assistant_msg.id, user_message, deep_research_params
             ))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
 
             # Return immediately - no streaming, no complex generators
             return
 
-        # Regular chat flow - stream and save response
+        # Regular chat flow - stream and save response. End the read transaction
+        # opened by the history/similarity queries first so the pooled connection
+        # is not held for the whole stream
+        await db.commit()
         try:
-            # Preferred: async generator named generate_chat_completion (already used for langchain adapters)
-            gen = getattr(llm_service, "generate_chat_completion", None)
-            if gen and inspect.isasyncgenfunction(gen):
-                logger.info("Using async generator llm_service.generate_chat_completion")
-                async for chunk in gen(messages):
-                    response_content += chunk
-                    yield (chunk, None)
-                # finished streaming
-            else:
-                # If provider was detected as langchain, try synchronous chat completion first, then generate
-                if is_langchain:
-                    logger.info("Provider appears to be LangChain-like; trying llm_service.generate_chat_completion(...) first, then generate")
-                    # Try chat completion first (supports messages format)
-                    chat_completion = getattr(llm_service, "generate_chat_completion", None)
-                    if callable(chat_completion):
-                        res = chat_completion(messages)
-                        if isinstance(res, dict):
-                            text = res.get("response") or res.get("text") or json.dumps(res)
-                        else:
-                            text = str(res)
-                        response_content += text
-                        yield (text, None)
-                    else:
-                        # Fallback to generate with prompt conversion
-                        sync_gen = getattr(llm_service, "generate", None)
-                        if callable(sync_gen):
-                            # sync generate may return dict/text
-                            prompt = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
-                            res = sync_gen(prompt)
-                            if isinstance(res, dict):
-                                text = res.get("response") or res.get("text") or json.dumps(res)
-                            else:
-                                text = str(res)
-                            response_content += text
-                            yield (text, None)
-                        else:
-                            # fallback to any callable that may accept messages
-                            fallback = getattr(llm_service, "call", None) or getattr(llm_service, "run", None)
-                            if callable(fallback):
-                                res = fallback(messages)
-                                text = res.get("response") if isinstance(res, dict) else str(res)
-                                response_content += text
-                                yield (text, None)
-                            else:
-                                raise RuntimeError("No usable LangChain interface found on llm_service")
-                # Else if provider looks like OpenAI/Azure, try their typical interfaces
-                elif is_openai_like:
-                    logger.info("Provider appears to be OpenAI/Azure-like; trying known interfaces")
-                    # 1) streaming-style method on llm_service
-                    create_stream = getattr(llm_service, "stream_chat_completion", None) or getattr(llm_service, "stream", None)
-                    if create_stream and inspect.iscoroutinefunction(create_stream):
-                        logger.info("Using async streaming interface on llm_service")
-                        async for chunk in create_stream(messages):
-                            response_content += chunk
-                            yield (chunk, None)
-                    # 2) sync create_chat_completion or generate
-                    else:
-                        create = getattr(llm_service, "create_chat_completion", None) or getattr(llm_service, "generate", None) or getattr(llm_service, "chat_completion", None)
-                        if callable(create):
-                            # Some wrappers expect OpenAI-style 'messages' while others expect a string prompt
-                            try:
-                                res = create(messages)
-                            except TypeError:
-                                prompt = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
-                                res = create(prompt)
-                            if isinstance(res, dict):
-                                # try common fields
-                                text = res.get("choices", [{}])[0].get("message", {}).get("content") if res.get("choices") else res.get("response") or res.get("text")
-                                if not text:
-                                    text = json.dumps(res)
-                            else:
-                                text = str(res)
-                            response_content += text
-                            yield (text, None)
-                        else:
-                            raise RuntimeError("No usable OpenAI/Azure interface found on llm_service")
-                else:
-                    # Unknown provider: attempt generic calls in safe order
-                    logger.info("Unknown provider type; attempting generic interfaces")
-                    # try async generator even if not detected
-                    if gen and inspect.isasyncgenfunction(gen):
-                        async for chunk in gen(messages):
-                            response_content += chunk
-                            yield (chunk, None)
-                    elif callable(getattr(llm_service, "generate", None)):
-                        prompt = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
-                        res = llm_service.generate(prompt)
-                        text = res.get("response") if isinstance(res, dict) else str(res)
-                        response_content += text
-                        yield (text, None)
-                    else:
-                        raise RuntimeError("llm_service does not expose a supported interface")
+            async for chunk in _batched_stream(_llm_stream(messages)):
+                response_parts.append(chunk)
+                yield (chunk, None)
         except Exception as e:
             logger.exception("LLM call failed: %s", e)
             err_msg = "Fehler beim Aufruf des LLM-Service."
-            response_content += err_msg
+            response_parts.append(err_msg)
             yield (err_msg, None)
         
+        response_content = "".join(response_parts)
+        
         # Process citations in response content to create markdown links
-        print(f"📖 Processing citations with mapping: {chunk_to_citation_mapping}")
+        logger.debug("Processing citations with mapping: %s", chunk_to_citation_mapping)
         processed_content = ChatService.process_citations_to_markdown(
             response_content,
             chunk_to_citation_mapping
         )
-        print(f"📖 Original content: {response_content[:200]}...")
-        print(f"📖 Processed content: {processed_content[:200]}...")
+        logger.debug("Original content: %.200s...", response_content)
+        logger.debug("Processed content: %.200s...", processed_content)
         
-        # Save assistant response with processed markdown links
-        assistant_msg = await ChatService.add_message(
+        # The message must exist before the client gets its ID, since the client
+        # reloads the history right after the done event
+        assistant_message = await ChatService.add_message(
             db,
             chat_id,
             MessageCreate(content=processed_content, role="assistant")
         )
         
         # Yield final message ID with document references and citation mapping
-        yield ("", assistant_msg.id, document_references, chunk_to_citation_mapping)
+        yield ("", assistant_message.id, document_references, chunk_to_citation_mapping)
     
     @staticmethod
     def process_citations_to_markdown(content: str, citation_mapping: dict) -> str:
         """Convert inline citations [1], [2] to markdown links using citation mapping"""
-        print(f"📖 process_citations_to_markdown called with content length: {len(content)}")
-        print(f"📖 Citation mapping: {citation_mapping}")
-
-        if not citation_mapping:
-            print("📖 No citation mapping provided, returning original content")
+        # Nothing to link, or no citation brackets at all
+        if not citation_mapping or '[' not in content:
             return content
         
-        import re
-        
-        def replace_citation(match):
-            citation_num = int(match.group(1))
-            print(f"📖 Found citation [{citation_num}]")
-            citation_data = citation_mapping.get(citation_num)
-            print(f"📖 Citation data for [{citation_num}]: {citation_data}")
-
-            if not citation_data:
-                # No mapping found, return original citation
-                print(f"📖 No mapping found for citation [{citation_num}], keeping original")
-                return match.group(0)
-            
-            # Extract citation data
+        # Prebuild the markdown link target for every usable citation so the
+        # regex callback is a dict lookup plus one concatenation
+        link_targets = {}
+        for citation_num, citation_data in citation_mapping.items():
             document_id = citation_data.get('document_id')
             chunk_id = citation_data.get('chunk_id')
-            document_title = citation_data.get('document_title', 'Unknown Document')
-            page_number = citation_data.get('page_number')
-            
             if not document_id or not chunk_id:
-                # Missing required data, return original citation
-                return match.group(0)
+                # Missing required data, keep original citation
+                continue
             
             # Build URL with highlighting parameters
             url = f"/knowledge/{document_id}?chunks={chunk_id}"
             # Don't include pages parameter - let the viewer show all pages and highlight specific chunk
 
-            # Create markdown link: [original_citation](url "title")
-            title = f"{document_title}"
-            if page_number:
-                title += f" (Page {page_number})"
+            document_title = citation_data.get('document_title', 'Unknown Document')
+            page_number = citation_data.get('page_number')
+            title = f"{document_title} (Page {page_number})" if page_number else document_title
 
-            result = f"[{match.group(0)}]({url} \"{title}\")"
-            print(f"📖 Converted [{citation_num}] to markdown: {result}")
-            return result
+            link_targets[int(citation_num)] = f"({url} \"{title}\")"
         
-        # Pattern to match citations like [1], [2], etc.
-        citation_pattern = r'\[(\d+)\]'
-        print(f"📖 Looking for citations with pattern: {citation_pattern}")
-        processed_content = re.sub(citation_pattern, replace_citation, content)
-
-        print(f"📖 Final processed content: {processed_content[:300]}...")
+        processed_content, citation_count = _CITATION_RE.subn(
+            functools.partial(_link_citation, link_targets), content
+        )
+        logger.debug("Citations processed: %d", citation_count)
         return processed_content
     
     @staticmethod
     async def get_or_create_chat(db: AsyncSession, chat_id: Optional[UUID] = None, title: str = "New Chat") -> Chat:
         """Get existing chat or create new one"""
         if chat_id:
-            chat = await ChatService.get_chat(db, chat_id)
+            # Existence check only; messages are not needed here
+            chat = await db.get(ChatModel, chat_id)
             if chat:
                 return chat
 
@@ -704,43 +930,46 @@ Do not end with opt-in questions or hedging closers. Do **not** say the followin
         return await ChatService.create_chat(db, ChatCreate(title=title))
     
     @staticmethod
-    async def _run_deep_research_background(db: AsyncSession, message_id: UUID, query: str, params: dict):
-        """Run deep research in background and update message with results"""
+    async def _run_deep_research_background(session_factory, message_id: UUID, query: str, params: dict):
+        """Run deep research in background and update message with results.
+
+        The request session is gone by the time this finishes, so results are
+        written on a fresh session from session_factory.
+        """
         try:
-            # Run the deep research
-            research_report = await DeepResearchService.run_deep_research(
-                query=query,
-                max_concurrent_research_units=params.get("max_concurrent_research_units", 1),
-                max_researcher_iterations=params.get("max_researcher_iterations", 1),
-                max_react_tool_calls=params.get("max_react_tool_calls", 1),
-                max_structured_output_retries=params.get("max_structured_output_retries", 1)
-            )
-            
-            # Update message with results
-            result = await db.execute(
-                select(MessageModel).where(MessageModel.id == message_id)
-            )
-            message = result.scalar_one_or_none()
+            # Bound concurrent runs so they cannot exhaust the connection pool
+            async with _deep_research_semaphore:
+                research_report = await DeepResearchService.run_deep_research(
+                    query=query,
+                    max_concurrent_research_units=params.get("max_concurrent_research_units", 1),
+                    max_researcher_iterations=params.get("max_researcher_iterations", 1),
+                    max_react_tool_calls=params.get("max_react_tool_calls", 1),
+                    max_structured_output_retries=params.get("max_structured_output_retries", 1)
+                )
             
-            if message:
-                message.content = research_report
-                message.deep_research_status = "completed"
-                message.token_count = llm_service.count_tokens(research_report)
-                await db.commit()
-                
+            values = {
+                "content": research_report,
+                "deep_research_status": "completed",
+                "token_count": llm_service.count_tokens(research_report)
+            }
         except Exception as e:
-            # Update message with error
-            result = await db.execute(
-                select(MessageModel).where(MessageModel.id == message_id)
-            )
-            message = result.scalar_one_or_none()
-            
-            if message:
-                error_message = f"Deep research failed: {str(e)}"
-                message.content = error_message
-                message.deep_research_status = "failed"
-                message.deep_research_error = str(e)
+            values = {
+                "content": f"Deep research failed: {str(e)}",
+                "deep_research_status": "failed",
+                "deep_research_error": str(e)
+            }
+        
+        # Update message with results
+        try:
+            async with session_factory() as db:
+                await db.execute(
+                    update(MessageModel)
+                    .where(MessageModel.id == message_id)
+                    .values(**values)
+                )
                 await db.commit()
+        except Exception:
+            logger.exception("Failed to store deep research result for message %s", message_id)
     
     @staticmethod
     async def get_message_status(db: AsyncSession, message_id: UUID) -> Optional[dict]:
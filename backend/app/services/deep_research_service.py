@@ -1,18 +1,55 @@
 
 import asyncio
+import functools
 import logging
-from langgraph.checkpoint.memory import MemorySaver
 
-from app.deep_research.deep_researcher import deep_researcher_builder
+import httpx
+from openai import RateLimitError
+
+from app.deep_research.deep_researcher import deep_researcher
 
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=1)
+def _base_configurable() -> dict:
+    """Run-independent part of the graph configuration, built once from settings.
+
+    Callers must not mutate the returned dict; overlay per-run values with |.
+    """
+    settings = get_settings()
+    return {
+        "allow_clarification": False,  # Skip clarification for faster testing
+        "search_api": "tavily",  # Use Tavily search API
+        "search_api_key": settings.search_api_key,
+        "azure_openai_endpoint": settings.azure_openai_endpoint,
+        "azure_openai_api_version": settings.azure_openai_api_version,
+        "azure_openai_api_key": settings.azure_openai_api_key,
+        "azure_openai_deployment_name": settings.azure_openai_deployment_name,
+        "summarization_model": f"azure_openai://{settings.azure_mini_deployment_name}",
+        "summarization_model_max_tokens": 8192,
+
+        "research_model": f"azure_openai://{settings.azure_openai_deployment_name}",
+        "research_model_max_tokens": 8000,
+
+        "compression_model": f"azure_openai://{settings.azure_openai_deployment_name}",
+        "compression_model_max_tokens": 8000,
+
+        "final_report_model": f"azure_openai://{settings.azure_openai_deployment_name}",
+        "final_report_model_max_tokens": 12000,
+    }
+
+
 class DeepResearchService:
-    @staticmethod
+    # The graph topology is static; it is compiled once when deep_researcher is
+    # imported and shared by every run
+    _graph = deep_researcher
+
+    @classmethod
     async def run_deep_research(
+        cls,
         query: str,
         max_concurrent_research_units: int = 1,
         max_researcher_iterations: int = 1,
@@ -39,35 +76,9 @@ class DeepResearchService:
             logger.info(f"Starting deep research for query: {query[:100]}...")
             logger.info(f"Research params: units={max_concurrent_research_units}, iterations={max_researcher_iterations}, tool_calls={max_react_tool_calls}")
 
-            settings = get_settings()
             config = {
-                "configurable": {
+                "configurable": _base_configurable() | {
                     "thread_id": "azure_research_patched",
-
-                    # Core settings
-                    "max_structured_output_retries": 1,
-                    "allow_clarification": False,  # Skip clarification for faster testing
-                    "max_concurrent_research_units": 1,  # Number of parallel researchers
-                    "search_api": "tavily",  # Use Tavily search API
-                    "search_api_key": settings.search_api_key,
-                    "max_researcher_iterations": 1,  # Supervisor reflection cycles
-                    "max_react_tool_calls": 1,  # Max searches per researcher
-                    "azure_openai_endpoint": settings.azure_openai_endpoint,
-                    "azure_openai_api_version": settings.azure_openai_api_version,
-                    "azure_openai_api_key": settings.azure_openai_api_key,
-                    "azure_openai_deployment_name": settings.azure_openai_deployment_name,
-                    "summarization_model": f"azure_openai://{settings.azure_mini_deployment_name}",
-                    "summarization_model_max_tokens": 8192,
-
-                    "research_model": f"azure_openai://{settings.azure_openai_deployment_name}",
-                    "research_model_max_tokens": 8000,
-
-                    "compression_model": f"azure_openai://{settings.azure_openai_deployment_name}",
-                    "compression_model_max_tokens": 8000,
-
-                    "final_report_model": f"azure_openai://{settings.azure_openai_deployment_name}",
-                    "final_report_model_max_tokens": 12000,
-
                     "max_concurrent_research_units": max_concurrent_research_units,
                     "max_researcher_iterations": max_researcher_iterations,
                     "max_react_tool_calls": max_react_tool_calls,
@@ -75,44 +86,70 @@ class DeepResearchService:
                 }
             }
 
-            # Compile the graph
-            graph = deep_researcher_builder.compile(checkpointer=MemorySaver())
-
             # Execute the research
-            result = await graph.ainvoke(
+            result = await cls._graph.ainvoke(
                 { "messages": [{"role": "user", "content": query}] }, config=config
             )
 
             final_report = result.get("final_report", "No report generated.")
 
-            # If final_report is not a string, try to extract the string content
-            if isinstance(final_report, (list, tuple)) and len(final_report) > 0:
-                # Try to find the actual report content in the structure
-                for item in final_report:
-                    if isinstance(item, str) and len(item) > 100:  # Assuming report is long
-                        logger.info("Deep research completed successfully")
-                        return item
-
+            # final_report is the writer message's content: normally a string, but
+            # LangChain may hand back a list of content blocks instead
             if isinstance(final_report, str):
                 logger.info("Deep research completed successfully")
                 return final_report
 
+            if isinstance(final_report, list):
+                logger.info("Deep research completed successfully")
+                return "".join(
+                    block if isinstance(block, str)
+                    else block.get("text", "") if isinstance(block, dict)
+                    else getattr(block, "text", "") or ""
+                    for block in final_report
+                )
+
             logger.warning("Deep research completed but report format unexpected")
             return str(final_report)
 
+        except RateLimitError as e:
+            logger.error("Deep research hit the Azure OpenAI rate limit", exc_info=True)
+            raise Exception(cls._rate_limit_message(
+                max_concurrent_research_units, max_researcher_iterations, max_react_tool_calls
+            )) from e
+
+        except httpx.HTTPStatusError as e:
+            logger.error("Deep research failed with HTTP %d", e.response.status_code, exc_info=True)
+            if e.response.status_code == 429:
+                detailed_error = cls._rate_limit_message(
+                    max_concurrent_research_units, max_researcher_iterations, max_react_tool_calls
+                )
+            else:
+                detailed_error = f"Deep research failed due to an unexpected error: {e}"
+            raise Exception(detailed_error) from e
+
         except Exception as e:
             error_msg = str(e)
-            logger.error(f"Deep research failed: {error_msg}", exc_info=True)
+            logger.error("Deep research failed: %s", error_msg, exc_info=True)
 
-            # Check if it's a rate limit error
-            if "rate limit" in error_msg.lower() or "429" in error_msg:
-                detailed_error = f"Rate limit exceeded during deep research. This usually happens when making too many API calls in a short time. The research parameters were: {max_concurrent_research_units} concurrent units, {max_researcher_iterations} iterations, {max_react_tool_calls} tool calls per unit. Please try again in a few minutes or use lower depth settings."
+            # Last resort for rate limits surfaced through wrappers we don't know
+            if "429" in error_msg or "rate limit" in error_msg.lower():
+                detailed_error = cls._rate_limit_message(
+                    max_concurrent_research_units, max_researcher_iterations, max_react_tool_calls
+                )
             else:
                 detailed_error = f"Deep research failed due to an unexpected error: {error_msg}"
 
             # Re-raise with detailed error for the calling service to handle
             raise Exception(detailed_error) from e
 
+    @staticmethod
+    def _rate_limit_message(
+        max_concurrent_research_units: int,
+        max_researcher_iterations: int,
+        max_react_tool_calls: int
+    ) -> str:
+        return f"Rate limit exceeded during deep research. This usually happens when making too many API calls in a short time. The research parameters were: {max_concurrent_research_units} concurrent units, {max_researcher_iterations} iterations, {max_react_tool_calls} tool calls per unit. Please try again in a few minutes or use lower depth settings."
+
 if __name__ == "__main__":
     # This is a simple example of how to run the deep research service.
     # You would typically call run_deep_research from your API layer.
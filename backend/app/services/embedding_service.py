@@ -1,13 +1,21 @@
 """
 Embedding service supporting both Azure OpenAI and Ollama
 """
-from typing import List, Optional, Tuple
-from openai import AzureOpenAI
+import asyncio
+import bisect
+import functools
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+from openai import AzureOpenAI, AsyncAzureOpenAI
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document as LangChainDocument
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredWordDocumentLoader
 import tiktoken
-import json
+import orjson
 import logging
 from uuid import UUID, uuid4
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -19,6 +27,40 @@ from app.services.embedding_utils import resize_embedding_and_maybe_reembed
 
 logger = logging.getLogger(__name__)
 
+# Inputs per embeddings request and how many requests may be in flight at once
+_EMBED_BATCH_SIZE = 16
+_EMBED_MAX_CONCURRENT = 10
+_embed_semaphore = asyncio.Semaphore(_EMBED_MAX_CONCURRENT)
+
+
+@functools.lru_cache(maxsize=8)
+def _get_tokenizer(model_name: str) -> tiktoken.Encoding:
+    """Load the BPE tables for a model once per process"""
+    return tiktoken.encoding_for_model(model_name)
+
+
+# Document parsing gets its own threads so large PDFs don't starve the default executor
+_DOC_LOADER_POOL = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="docload")
+
+# Text splitter settings (characters)
+_CHUNK_SIZE = 1000
+_CHUNK_OVERLAP = 200
+
+# Bounds for the per-service content-hash caches
+_TOKEN_COUNT_CACHE_SIZE = 4096
+_EMBED_CACHE_SIZE = 1024
+
+
+def _content_key(text: str) -> bytes:
+    """Compact cache key so cached entries don't keep the full text alive"""
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+class SearchResult(NamedTuple):
+    """Chunks returned by similarity_search and whether they came from the fallback query"""
+    chunks: List[DocumentChunk]
+    using_fallback: bool
+
 
 class EmbeddingService:
     def __init__(self):
@@ -26,6 +68,8 @@ class EmbeddingService:
         # Detect provider based on configuration
         provider = (settings.llm_provider or "azure_openai").lower()
         self.provider = provider
+        self._embedding_model = settings.azure_openai_embedding_deployment_name
+        self._hnsw_ef_search = settings.hnsw_ef_search
 
         # Initialize appropriate embedding client
         if provider == "ollama":
@@ -33,6 +77,7 @@ class EmbeddingService:
             from app.services.langchain import langchain_ollama_service
             self.ollama_service = langchain_ollama_service
             self.client = None
+            self.async_client = None
             self.tokenizer = None
             logger.info("Using Ollama for embeddings")
         else:
@@ -43,8 +88,13 @@ class EmbeddingService:
                     azure_endpoint=settings.azure_openai_endpoint,
                     api_key=settings.azure_openai_api_key
                 )
+                self.async_client = AsyncAzureOpenAI(
+                    api_version=settings.azure_openai_api_version,
+                    azure_endpoint=settings.azure_openai_endpoint,
+                    api_key=settings.azure_openai_api_key
+                )
                 # Initialize tokenizer for counting tokens
-                self.tokenizer = tiktoken.encoding_for_model(settings.azure_openai_embedding_deployment_name)
+                self.tokenizer = _get_tokenizer(settings.azure_openai_embedding_deployment_name)
                 self.ollama_service = None
                 logger.info("Using Azure OpenAI for embeddings")
             except Exception as e:
@@ -53,52 +103,107 @@ class EmbeddingService:
                 from app.services.langchain import langchain_ollama_service
                 self.ollama_service = langchain_ollama_service
                 self.client = None
+                self.async_client = None
                 self.tokenizer = None
                 self.provider = "ollama"
                 logger.info("Fallback to Ollama for embeddings")
         
+        # LRU caches keyed by _content_key(text)
+        self._token_count_cache: OrderedDict[bytes, int] = OrderedDict()
+        self._embed_cache: OrderedDict[bytes, List[float]] = OrderedDict()
+
         # Initialize text splitter for chunking
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,  # Characters per chunk
-            chunk_overlap=200,  # Overlap between chunks
+            chunk_size=_CHUNK_SIZE,  # Characters per chunk
+            chunk_overlap=_CHUNK_OVERLAP,  # Overlap between chunks
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
     
     def count_tokens(self, text: str) -> int:
         """Count tokens in text"""
-        if self.tokenizer:
-            return len(self.tokenizer.encode(text))
-        else:
+        if not self.tokenizer:
             # Simple approximation for Ollama
             return max(1, len(text) // 4)
+
+        key = _content_key(text)
+        count = self._token_count_cache.get(key)
+        if count is not None:
+            self._token_count_cache.move_to_end(key)
+            return count
+
+        count = len(self.tokenizer.encode(text))
+        self._token_count_cache[key] = count
+        if len(self._token_count_cache) > _TOKEN_COUNT_CACHE_SIZE:
+            self._token_count_cache.popitem(last=False)
+        return count
+    
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for several texts with one batched tokenizer call"""
+        if not self.tokenizer:
+            return [max(1, len(text) // 4) for text in texts]
+        return [len(tokens) for tokens in self.tokenizer.encode_ordinary_batch(texts, num_threads=8)]
     
     def embed_text(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
+        key = _content_key(text)
+        cached = self._embed_cache.get(key)
+        if cached is not None:
+            self._embed_cache.move_to_end(key)
+            return cached
+
         if self.provider == "ollama" and self.ollama_service:
-            return self.ollama_service.embed(text)
+            embedding = self.ollama_service.embed(text)
         elif self.client:
-            settings = get_settings()
             response = self.client.embeddings.create(
                 input=[text],
-                model=settings.azure_openai_embedding_deployment_name
+                model=self._embedding_model
             )
-            return response.data[0].embedding
+            embedding = response.data[0].embedding
         else:
             raise RuntimeError("No embedding service available")
 
+        self._embed_cache[key] = embedding
+        if len(self._embed_cache) > _EMBED_CACHE_SIZE:
+            self._embed_cache.popitem(last=False)
+        return embedding
+
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for multiple texts"""
         if self.provider == "ollama" and self.ollama_service:
             # Ollama doesn't have batch embedding, so we embed one by one
             return [self.ollama_service.embed(text) for text in texts]
         elif self.client:
-            settings = get_settings()
-            response = self.client.embeddings.create(
-                input=texts,
-                model=settings.azure_openai_embedding_deployment_name
-            )
-            return [item.embedding for item in response.data]
+            embeddings = []
+            for start in range(0, len(texts), _EMBED_BATCH_SIZE):
+                response = self.client.embeddings.create(
+                    input=texts[start:start + _EMBED_BATCH_SIZE],
+                    model=self._embedding_model
+                )
+                embeddings.extend(item.embedding for item in response.data)
+            return embeddings
+        else:
+            raise RuntimeError("No embedding service available")
+
+    async def aembed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for multiple texts, sending sub-batches concurrently"""
+        if self.provider == "ollama" and self.ollama_service:
+            async def embed_one(text: str) -> List[float]:
+                async with _embed_semaphore:
+                    return await asyncio.to_thread(self.ollama_service.embed, text)
+
+            return list(await asyncio.gather(*(embed_one(text) for text in texts)))
+        elif self.async_client:
+            async def embed_batch(batch: List[str]) -> List[List[float]]:
+                async with _embed_semaphore:
+                    response = await self.async_client.embeddings.create(input=batch, model=self._embedding_model)
+                return [item.embedding for item in response.data]
+
+            batches = await asyncio.gather(*(
+                embed_batch(texts[start:start + _EMBED_BATCH_SIZE])
+                for start in range(0, len(texts), _EMBED_BATCH_SIZE)
+            ))
+            return [embedding for batch in batches for embedding in batch]
         else:
             raise RuntimeError("No embedding service available")
     
@@ -110,29 +215,29 @@ class EmbeddingService:
         if not chat.messages:
             return []
         
-        # Sort messages by creation time
-        sorted_messages = sorted(chat.messages, key=lambda x: x.created_at)
+        # Messages are already ordered by creation time via the relationship
+        sorted_messages = chat.messages
         
-        # Build conversation text with message boundaries
-        conversation_parts = []
+        # Build conversation text with message boundaries, writing each part
+        # straight into the buffer instead of building per-message strings
+        buffer = io.StringIO()
         message_boundaries = []
-        current_pos = 0
         
         for msg in sorted_messages:
-            role_prefix = f"\n\n{msg.role.upper()}:\n"
-            content = msg.content
-            full_text = f"{role_prefix}{content}"
+            start = buffer.tell()
+            buffer.write("\n\n")
+            buffer.write(msg.role.upper())
+            buffer.write(":\n")
+            buffer.write(msg.content)
             
-            conversation_parts.append(full_text)
             message_boundaries.append({
                 'message_id': msg.id,
-                'start': current_pos,
-                'end': current_pos + len(full_text),
+                'start': start,
+                'end': buffer.tell(),
                 'role': msg.role
             })
-            current_pos += len(full_text)
         
-        full_conversation = "".join(conversation_parts)
+        full_conversation = buffer.getvalue()
         
         # Split into chunks using LangChain
         documents = [LangChainDocument(
@@ -147,19 +252,28 @@ class EmbeddingService:
         chunks = self.text_splitter.split_documents(documents)
         
         # Map chunks back to original messages
+        boundary_ends = [boundary['end'] for boundary in message_boundaries]
         result_chunks = []
+        # Chunks come out in document order and overlap by at most _CHUNK_OVERLAP,
+        # so each one starts no earlier than the previous end minus the overlap
+        search_from = 0
         for i, chunk in enumerate(chunks):
             chunk_content = chunk.page_content
             
             # Find which messages this chunk spans
-            chunk_start = full_conversation.find(chunk_content)
+            chunk_start = full_conversation.find(chunk_content, search_from)
+            if chunk_start == -1:
+                chunk_start = full_conversation.find(chunk_content)
             chunk_end = chunk_start + len(chunk_content)
+            search_from = max(0, chunk_end - _CHUNK_OVERLAP)
             
+            # Boundaries are contiguous and sorted, so the overlapping messages are
+            # the run starting at the first one that ends after chunk_start
             chunk_message_ids = []
-            for boundary in message_boundaries:
-                # Check if message overlaps with chunk
-                if (boundary['start'] < chunk_end and boundary['end'] > chunk_start):
-                    chunk_message_ids.append(boundary['message_id'])
+            b = bisect.bisect_right(boundary_ends, chunk_start)
+            while b < len(message_boundaries) and message_boundaries[b]['start'] < chunk_end:
+                chunk_message_ids.append(message_boundaries[b]['message_id'])
+                b += 1
             
             # Create metadata
             metadata = {
@@ -198,25 +312,28 @@ class EmbeddingService:
             title=f"Chat: {chat.title}",
             source_type="chat",
             source_id=str(chat.id),
-            document_metadata=json.dumps({
-                "chat_id": str(chat.id),
+            # orjson writes the UUID and datetime in the same string forms as str()/isoformat()
+            document_metadata=orjson.dumps({
+                "chat_id": chat.id,
                 "chat_title": chat.title,
                 "message_count": len(chat.messages),
-                "created_at": chat.created_at.isoformat() if chat.created_at else None
-            })
+                "created_at": chat.created_at
+            }).decode()
         )
         
         # Extract content for batch embedding
         chunk_contents = [chunk[0] for chunk in chunks]
         
         # Generate embeddings for all chunks at once
-        embeddings = self.embed_texts(chunk_contents)
+        embeddings = await self.aembed_texts(chunk_contents)
+        token_counts = self.count_tokens_batch(chunk_contents)
         
+        settings = get_settings()
+        target_dim = settings.embedding_dim or 1536
+
         # Create DocumentChunk objects
         document_chunks = []
-        for i, ((content, message_ids, metadata), embedding) in enumerate(zip(chunks, embeddings)):
-            token_count = self.count_tokens(content)
-
+        for i, ((content, message_ids, metadata), embedding, token_count) in enumerate(zip(chunks, embeddings, token_counts)):
             # Enhanced metadata for chat chunks
             chunk_metadata = {
                 **metadata,
@@ -226,8 +343,6 @@ class EmbeddingService:
             }
 
             # Handle embedding dimension adjustment
-            settings = get_settings()
-            target_dim = settings.embedding_dim or 1536
             current_dim = len(embedding) if embedding else 0
 
             # Generate a temporary doc_id for dimension handling
@@ -249,7 +364,7 @@ class EmbeddingService:
                 embedding=adjusted_embedding,
                 embedding_model=settings.embedding_model_resolved,
                 embedding_dim=target_dim,
-                chunk_metadata=json.dumps(chunk_metadata),
+                chunk_metadata=chunk_metadata,
                 summary=None  # Could add summarization later
             )
             
@@ -266,9 +381,18 @@ class EmbeddingService:
         source_types: List[str] = None,
         tag_ids: List[UUID] = None,
         document_ids: List[UUID] = None
-    ) -> List[DocumentChunk]:
+    ) -> SearchResult:
         """
         Perform similarity search against all document chunks (unified search).
+        Returns the chunks plus a flag telling whether the closest-match fallback
+        was used because nothing was within the similarity threshold.
+
+        The thresholded result and the fallback come from one query: the
+        max(limit, 3) closest chunks that pass the source-type/tag/document
+        filters. The fallback is therefore the 3 closest chunks *within the
+        filters*, as it was with the separate fallback query. That relies on
+        filtered searches bypassing the approximate HNSW index (see
+        _apply_vector_search_settings), which test/test_rag_filtered.py checks.
         """
         from sqlalchemy import select, func
         from sqlalchemy.orm import selectinload, joinedload
@@ -277,19 +401,24 @@ class EmbeddingService:
         # Generate embedding for the query
         query_embedding = self.embed_text(query)
         
-        # First, try to find documents within the similarity threshold
+        previous_settings = await self._apply_vector_search_settings(
+            db, bool(source_types or tag_ids or document_ids)
+        )
+        
+        # The query vector is bound once and the distance is only referenced by label
+        distance = DocumentChunk.embedding.cosine_distance(query_embedding).label('distance')
+        
+        # One query serves both cases: the closest chunks ordered by distance,
+        # enough of them for either the thresholded result or the top-3 fallback
         stmt = (
             select(
                 DocumentChunk,
                 Document.title.label('document_title'),
                 Document.source_type,
                 Document.source_id,
-                DocumentChunk.embedding.cosine_distance(query_embedding).label('distance')
+                distance
             )
             .join(Document)
-            .where(
-                DocumentChunk.embedding.cosine_distance(query_embedding) < (1.0 - similarity_threshold)
-            )
         )
         
         # User filtering removed - no longer needed
@@ -311,47 +440,22 @@ class EmbeddingService:
             stmt = stmt.where(Document.id.in_(document_ids))
         
         # Order by distance and limit
-        stmt = stmt.order_by('distance').limit(limit)
+        stmt = stmt.order_by(distance).limit(max(limit, 3))
         
         # Execute query
         result = await db.execute(stmt)
-        rows = result.all()
-        
-        # If no documents found within threshold, get the top 3 closest documents
-        if not rows:
-            fallback_stmt = (
-                select(
-                    DocumentChunk,
-                    Document.title.label('document_title'),
-                    Document.source_type,
-                    Document.source_id,
-                    DocumentChunk.embedding.cosine_distance(query_embedding).label('distance')
-                )
-                .join(Document)
-            )
-            
-            # Add source type filtering if specified
-            if source_types:
-                fallback_stmt = fallback_stmt.where(Document.source_type.in_(source_types))
-            
-            # Add tag filtering if specified for fallback too
-            if tag_ids:
-                fallback_stmt = fallback_stmt.join(
-                    DocumentTag, Document.id == DocumentTag.document_id
-                ).where(
-                    DocumentTag.tag_id.in_(tag_ids)
-                )
-            
-            # Add document filtering if specified for fallback too
-            if document_ids:
-                fallback_stmt = fallback_stmt.where(Document.id.in_(document_ids))
-            
-            # Order by distance and get top 3
-            fallback_stmt = fallback_stmt.order_by('distance').limit(3)
-            
-            # Execute fallback query
-            result = await db.execute(fallback_stmt)
-            rows = result.all()
+        candidates = result.all()
+        await self._restore_vector_search_settings(db, previous_settings)
+        
+        # Rows are sorted by distance, so those within the threshold form a prefix
+        max_distance = 1.0 - similarity_threshold
+        rows = [row for row in candidates[:limit] if row.distance < max_distance]
+        
+        # If no documents found within threshold, use the top 3 closest documents
+        # that match the filters (same semantics as the former second query)
+        using_fallback = not rows
+        if using_fallback:
+            rows = candidates[:3]
         
         # Convert results to DocumentChunk objects with additional metadata
         chunks = []
@@ -366,7 +470,58 @@ class EmbeddingService:
             
             chunks.append(chunk)
         
-        return chunks
+        return SearchResult(chunks, using_fallback)
+    
+    async def _apply_vector_search_settings(self, db: AsyncSession, filtered: bool) -> dict:
+        """Tune the vector scan for a similarity search; returns the values it replaced.
+
+        The HNSW index is approximate and applies the WHERE clause only to the
+        candidates it returns, so selective filters (source type, #tag, /doc) can
+        come back short or empty. Filtered searches therefore disable index scans
+        and use the exact scan over the filtered rows. The settings are
+        transaction-local; callers restore them with _restore_vector_search_settings
+        so later queries in the same transaction are unaffected.
+        """
+        from sqlalchemy import text
+        
+        index_settings = {}
+        if self._hnsw_ef_search:
+            index_settings["hnsw.ef_search"] = str(self._hnsw_ef_search)
+        if filtered:
+            index_settings["enable_indexscan"] = "off"
+        if not index_settings:
+            return {}
+        
+        # Read each current value before replacing it, in one round-trip;
+        # SET can't take bind params, set_config can
+        params = {}
+        columns = []
+        for i, (name, value) in enumerate(index_settings.items()):
+            params[f"name{i}"] = name
+            params[f"value{i}"] = value
+            columns.append(f"current_setting(:name{i}, true)")
+            columns.append(f"set_config(:name{i}, :value{i}, true)")
+        result = await db.execute(text("SELECT " + ", ".join(columns)), params)
+        row = result.one()
+        return {
+            name: row[2 * i]
+            for i, name in enumerate(index_settings)
+            if row[2 * i] is not None
+        }
+    
+    async def _restore_vector_search_settings(self, db: AsyncSession, previous: dict) -> None:
+        """Put back the settings replaced by _apply_vector_search_settings"""
+        from sqlalchemy import text
+        
+        if not previous:
+            return
+        params = {}
+        calls = []
+        for i, (name, value) in enumerate(previous.items()):
+            params[f"name{i}"] = name
+            params[f"value{i}"] = value
+            calls.append(f"set_config(:name{i}, :value{i}, true)")
+        await db.execute(text("SELECT " + ", ".join(calls)), params)
     
     async def process_uploaded_document(
         self,
@@ -399,85 +554,109 @@ class EmbeddingService:
             source_id=str(document_id),
             filename=original_filename,
             file_type=file_type,
-            document_metadata=json.dumps({
+            document_metadata=orjson.dumps({
                 "file_path": file_path,
                 "original_filename": original_filename,
                 "file_type": file_type,
                 "file_size": Path(file_path).stat().st_size if Path(file_path).exists() else None,
                 "total_pages": len(documents) if file_type == "application/pdf" else None
-            })
+            }).decode()
         )
         
         db.add(document)
         await db.flush()  # Get the document ID
         
-        # Process each page/document separately to maintain page information
-        chunk_objects = []
-        global_chunk_index = 0
+        # Split each page/document separately to maintain page information.
+        # Splitting runs on the loader pool and every full batch of chunk texts is
+        # sent for embedding right away, so the requests are in flight while the
+        # remaining pages are still being split
+        loop = asyncio.get_running_loop()
+        pending_chunks = []
+        chunk_texts = []
+        embed_tasks = []
+        batch_start = 0
+        try:
+            for doc_idx, doc in enumerate(documents):
+                # Extract page number from metadata (PyPDFLoader provides this)
+                page_num = doc.metadata.get('page', doc_idx) if hasattr(doc, 'metadata') else doc_idx
+                
+                # Split this page/document into chunks
+                page_chunks = await loop.run_in_executor(
+                    _DOC_LOADER_POOL, self.text_splitter.split_text, doc.page_content
+                )
+                
+                for local_chunk_idx, chunk_content in enumerate(page_chunks):
+                    pending_chunks.append((doc.page_content, page_num, local_chunk_idx, len(page_chunks), chunk_content))
+                    chunk_texts.append(chunk_content)
+                
+                if len(chunk_texts) - batch_start >= _EMBED_BATCH_SIZE:
+                    embed_tasks.append(asyncio.create_task(self.aembed_texts(chunk_texts[batch_start:])))
+                    batch_start = len(chunk_texts)
+            
+            if batch_start < len(chunk_texts):
+                embed_tasks.append(asyncio.create_task(self.aembed_texts(chunk_texts[batch_start:])))
+            
+            token_counts = self.count_tokens_batch(chunk_texts)
+            embeddings = [embedding for batch in await asyncio.gather(*embed_tasks) for embedding in batch]
+        finally:
+            # On any failure, don't leave embedding requests running unobserved
+            for task in embed_tasks:
+                task.cancel()
+            await asyncio.gather(*embed_tasks, return_exceptions=True)
         
-        for doc_idx, doc in enumerate(documents):
-            # Extract page number from metadata (PyPDFLoader provides this)
-            page_num = doc.metadata.get('page', doc_idx) if hasattr(doc, 'metadata') else doc_idx
+        settings = get_settings()
+        target_dim = settings.embedding_dim or 1536
+        
+        chunk_objects = []
+        for global_chunk_index, ((page_text, page_num, local_chunk_idx, chunks_on_page, chunk_content), embedding, token_count) in enumerate(zip(pending_chunks, embeddings, token_counts)):
             
-            # Split this page/document into chunks
-            page_chunks = self.text_splitter.split_text(doc.page_content)
+            # Enhanced metadata for PDF chunks
+            chunk_metadata = {
+                "page_number": page_num + 1,  # Convert to 1-based indexing for display
+                "page_index": page_num,  # Keep 0-based for processing
+                "chunk_on_page": local_chunk_idx,
+                "total_chunks_on_page": chunks_on_page
+            }
             
-            for local_chunk_idx, chunk_content in enumerate(page_chunks):
-                # Generate embedding for this chunk
-                embedding = self.embed_text(chunk_content)
-                token_count = self.count_tokens(chunk_content)
-                
-                # Enhanced metadata for PDF chunks
-                chunk_metadata = {
-                    "page_number": page_num + 1,  # Convert to 1-based indexing for display
-                    "page_index": page_num,  # Keep 0-based for processing
-                    "chunk_on_page": local_chunk_idx,
-                    "total_chunks_on_page": len(page_chunks)
-                }
+            # For PDFs, try to get more specific location info
+            if file_type == "application/pdf":
+                # Find position of chunk within the page
+                chunk_start = page_text.find(chunk_content)
+                chunk_end = chunk_start + len(chunk_content) if chunk_start != -1 else -1
                 
-                # For PDFs, try to get more specific location info
-                if file_type == "application/pdf":
-                    # Find position of chunk within the page
-                    page_text = doc.page_content
-                    chunk_start = page_text.find(chunk_content)
-                    chunk_end = chunk_start + len(chunk_content) if chunk_start != -1 else -1
-                    
-                    chunk_metadata.update({
-                        "chunk_start_char": chunk_start,
-                        "chunk_end_char": chunk_end,
-                        "page_char_count": len(page_text)
-                    })
-                
-                # Handle embedding dimension adjustment
-                settings = get_settings()
-                target_dim = settings.embedding_dim or 1536
-                current_dim = len(embedding) if embedding else 0
-
-                chunk_id = uuid4()
-
-                # Resize embedding if needed
-                adjusted_embedding = await resize_embedding_and_maybe_reembed(
-                    text=chunk_content,
-                    current_vec=embedding,
-                    current_dim=current_dim,
-                    target_dim=target_dim,
-                    doc_id=str(chunk_id)
-                )
+                chunk_metadata.update({
+                    "chunk_start_char": chunk_start,
+                    "chunk_end_char": chunk_end,
+                    "page_char_count": len(page_text)
+                })
+            
+            # Handle embedding dimension adjustment
+            current_dim = len(embedding) if embedding else 0
 
-                # Create chunk object
-                chunk = DocumentChunk(
-                    id=chunk_id,
-                    document_id=document_id,
-                    content=chunk_content,
-                    chunk_index=global_chunk_index,
-                    token_count=token_count,
-                    embedding=adjusted_embedding,
-                    embedding_model=settings.embedding_model_resolved,
-                    embedding_dim=target_dim,
-                    chunk_metadata=json.dumps(chunk_metadata)
-                )
-                chunk_objects.append(chunk)
-                global_chunk_index += 1
+            chunk_id = uuid4()
+
+            # Resize embedding if needed
+            adjusted_embedding = await resize_embedding_and_maybe_reembed(
+                text=chunk_content,
+                current_vec=embedding,
+                current_dim=current_dim,
+                target_dim=target_dim,
+                doc_id=str(chunk_id)
+            )
+
+            # Create chunk object
+            chunk = DocumentChunk(
+                id=chunk_id,
+                document_id=document_id,
+                content=chunk_content,
+                chunk_index=global_chunk_index,
+                token_count=token_count,
+                embedding=adjusted_embedding,
+                embedding_model=settings.embedding_model_resolved,
+                embedding_dim=target_dim,
+                chunk_metadata=chunk_metadata
+            )
+            chunk_objects.append(chunk)
         
         # Add all chunks to database
         db.add_all(chunk_objects)
@@ -504,8 +683,7 @@ class EmbeddingService:
     
     async def _async_load(self, loader) -> List[LangChainDocument]:
         """Async wrapper for document loader"""
-        import asyncio
-        return await asyncio.get_event_loop().run_in_executor(None, loader.load)
+        return await asyncio.get_running_loop().run_in_executor(_DOC_LOADER_POOL, loader.load)
 
 
 # Global instance
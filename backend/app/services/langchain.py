@@ -168,6 +168,10 @@ class LangchainOllamaService:
         # an actual tokenizer like tiktoken or the model's specific tokenizer
         return max(1, len(text) // 4)
 
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for several texts using the same estimation as count_tokens."""
+        return [max(1, len(text) // 4) for text in texts]
+
     def close(self):
         try:
             self._client.close()
@@ -0,0 +1,32 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chat_service import _batched_stream
+
+
+async def failing_stream(tokens: int):
+    for i in range(tokens):
+        yield f"t{i} "
+    raise RuntimeError("LLM stream broke")
+
+
+async def test_failing_stream_delivers_buffered_prefix():
+    received = []
+    try:
+        async for batch in _batched_stream(failing_stream(10)):
+            received.append(batch)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("the stream error should propagate")
+
+    expected = "".join(f"t{i} " for i in range(10))
+    print(f"Received {len(received)} batches: {''.join(received)!r}")
+    assert "".join(received) == expected, "buffered prefix was lost"
+    print("OK: buffered prefix delivered before the error")
+
+
+if __name__ == "__main__":
+    asyncio.run(test_failing_stream_delivers_buffered_prefix())
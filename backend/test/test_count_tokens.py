@@ -0,0 +1,24 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.azure_openai import azure_openai_service
+
+
+def test_count_tokens_batch_with_special_tokens():
+    texts = [
+        "A normal message",
+        "Edited message that mentions <|endoftext|> literally",
+        "<|im_start|>user<|im_end|>",
+    ]
+    counts = azure_openai_service.count_tokens_batch(texts)
+    print(f"Token counts: {counts}")
+    assert len(counts) == len(texts)
+    assert all(count > 0 for count in counts)
+    # Special-token text is counted as plain text, not rejected
+    assert counts[0] == len(azure_openai_service.tokenizer.encode_ordinary(texts[0]))
+    print("OK: special-token strings are counted without raising")
+
+
+if __name__ == "__main__":
+    test_count_tokens_batch_with_special_tokens()
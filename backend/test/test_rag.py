@@ -5,7 +5,7 @@ from app.services.embedding_service import embedding_service
 async def test_similarity_search():
     async with AsyncSessionLocal() as db:
         # Test similarity search
-        results = await embedding_service.similarity_search(
+        results, _ = await embedding_service.similarity_search(
             db=db,
             query='test query',
             limit=5,
@@ -41,7 +41,7 @@ async def test_similarity_search_debug():
         for query in test_queries:
             print(f"\nTesting query: '{query}'")
             try:
-                results = await embedding_service.similarity_search(
+                results, _ = await embedding_service.similarity_search(
                     db=db,
                     query=query,
                     limit=3,
@@ -0,0 +1,76 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.database import async_session_maker
+from app.services.embedding_service import embedding_service
+from sqlalchemy import text
+
+
+async def exact_top_distances(db, query: str, document_id, limit: int):
+    """Reference result: the closest distances within the filter, without the vector index"""
+    query_embedding = embedding_service.embed_text(query)
+    await db.execute(text("SELECT set_config('enable_indexscan', 'off', true)"))
+    result = await db.execute(
+        text(
+            "SELECT embedding <=> CAST(:embedding AS vector) AS distance "
+            "FROM document_chunks WHERE document_id = :document_id "
+            "ORDER BY embedding <=> CAST(:embedding AS vector) LIMIT :limit"
+        ),
+        {"document_id": document_id, "embedding": str(query_embedding), "limit": limit}
+    )
+    distances = [row.distance for row in result.fetchall()]
+    await db.rollback()
+    return distances
+
+
+async def test_filtered_similarity_search():
+    async with async_session_maker() as db:
+        # Filter on the document with the fewest chunks; that is where an index scan
+        # followed by the WHERE clause is most likely to come back empty
+        result = await db.execute(text(
+            "SELECT document_id, COUNT(*) AS chunk_count FROM document_chunks "
+            "GROUP BY document_id ORDER BY chunk_count LIMIT 1"
+        ))
+        row = result.first()
+        if row is None:
+            print("No chunks in DB, nothing to test")
+            return
+        document_id = row.document_id
+        print(f"Filtering on document {document_id} ({row.chunk_count} chunks)")
+
+        queries = ["test query", "What is my name?", "birthday"]
+        for query in queries:
+            print(f"\nTesting query: '{query}'")
+            expected = await exact_top_distances(db, query, document_id, 3)
+
+            # A threshold nothing can pass forces the top-3 fallback
+            results, using_fallback = await embedding_service.similarity_search(
+                db=db,
+                query=query,
+                limit=5,
+                similarity_threshold=1.0,
+                document_ids=[document_id]
+            )
+
+            # The search must not leave its scan settings behind for later queries
+            result = await db.execute(text("SELECT current_setting('enable_indexscan')"))
+            assert result.scalar() == "on", "enable_indexscan was not restored after the search"
+
+            print(f"  Found {len(results)} results (fallback={using_fallback})")
+            assert using_fallback, "threshold 1.0 should always use the fallback"
+            assert results, "filtered fallback returned no chunks"
+            assert all(r.document_id == document_id for r in results), "result outside the document filter"
+            # Filtered searches use the exact scan, so they return the closest chunks
+            # within the filter; compare distances since equal distances may tie in any order
+            got = [r.search_distance for r in results]
+            assert len(got) == len(expected) and all(
+                abs(a - b) < 1e-6 for a, b in zip(got, expected)
+            ), f"expected distances {expected}, got {got}"
+            print("  OK: same closest chunks as the exact scan")
+            await db.rollback()
+
+
+if __name__ == "__main__":
+    asyncio.run(test_filtered_similarity_search())
@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chat_service import ChatService
+
+
+# message -> (expected tags, expected documents)
+CASES = {
+    "Compare #finance and [tag:q3-report]": ({"finance", "q3-report"}, set()),
+    '/doc "Quarterly Report" and /document notes.pdf': (set(), {"Quarterly Report", "notes.pdf"}),
+    # A hashtag after /doc is both a tag and a single-word document name
+    "/doc #foo": ({"foo"}, {"#foo"}),
+    # Unquoted names run to the next whitespace, quotes included
+    '/document a"b': (set(), {'a"b'}),
+    # Hashtags inside a quoted document name are still tags
+    '/doc "Report #3"': ({"3"}, {"Report #3"}),
+    # An unterminated quote is neither a quoted nor an unquoted reference
+    '/doc "unterminated name': (set(), set()),
+    "no references here": (set(), set()),
+}
+
+
+def test_reference_extraction():
+    for message, (expected_tags, expected_documents) in CASES.items():
+        tags = ChatService.extract_tags_from_message(message)
+        documents = ChatService.extract_document_references_from_message(message)
+        print(f"{message!r}: tags={tags} documents={documents}")
+        assert tags == expected_tags, f"tags for {message!r}"
+        assert documents == expected_documents, f"documents for {message!r}"
+
+        combined = ChatService.extract_references_from_message(message)
+        assert combined == (tags, documents), f"combined extraction for {message!r}"
+        assert all(type(refs) is set for refs in combined), "extract_references_from_message should return sets"
+    print("OK: reference extraction matches the pinned cases")
+
+
+if __name__ == "__main__":
+    test_reference_extraction()
@@ -0,0 +1,50 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.database import async_session_maker
+from app.schemas.chat import ChatCreate, ChatUpdate, MessageCreate
+from app.services.chat_service import ChatService
+
+
+async def test_edit_middle_of_chat_keeps_order():
+    async with async_session_maker() as db:
+        chat = await ChatService.create_chat(db, ChatCreate(title="update_chat order test"))
+        try:
+            stored = []
+            for role, content in [("user", "first"), ("assistant", "second"), ("user", "third")]:
+                stored.append(await ChatService.add_message(db, chat.id, MessageCreate(content=content, role=role)))
+
+            # Insert two new messages in the middle and one at the front, edit one in place
+            payload = [
+                {"content": "new at front", "role": "user"},
+                {"id": str(stored[0].id), "content": "first", "role": "user"},
+                {"content": "new middle 1", "role": "assistant"},
+                {"content": "new middle 2", "role": "user"},
+                {"id": str(stored[1].id), "content": "second (edited)", "role": "assistant"},
+                {"id": str(stored[2].id), "content": "third", "role": "user"},
+            ]
+            expected = [msg["content"] for msg in payload]
+
+            updated = await ChatService.update_chat(db, chat.id, ChatUpdate(messages=payload))
+            returned = [msg.content for msg in updated.messages]
+            print(f"update_chat returned: {returned}")
+            assert returned == expected, "update_chat payload order is wrong"
+
+            # Re-read from the database in a fresh session
+            async with async_session_maker() as read_db:
+                reread = await ChatService.get_chat(read_db, chat.id)
+            reread_contents = [msg.content for msg in reread.messages]
+            print(f"get_chat returned:    {reread_contents}")
+            assert reread_contents == expected, "re-read order differs from the edited order"
+
+            timestamps = [msg.created_at for msg in reread.messages]
+            assert all(a < b for a, b in zip(timestamps, timestamps[1:])), "created_at is not strictly increasing"
+            print("OK: edited chat re-reads in payload order")
+        finally:
+            await ChatService.delete_chat(db, chat.id)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_edit_middle_of_chat_keeps_order())